@@ -0,0 +1,152 @@
+"""
+Offline answerability precheck: drop tasks whose expected answer never appears in
+what the agent could retrieve.
+
+For each task this runs the exact-question search and fetches the top-k result URLs
+through the server's search and FetchPipeline, formatted exactly as the fetch tool
+returns them, then checks with the evaluate tool's matching rule whether
+expected_answer appears in any result title or fetched page. Tasks are checked in
+parallel. A task is dropped only when its search succeeded, every fetch returned
+content and the answer is still missing; tasks that could not be fully checked (search
+error, failed fetch) are kept and reported as unchecked. Kept tasks are written to
+--out and the evidence for every task (where the answer was found, or why it was
+not) to --evidence.
+
+    python answerability_precheck.py deep_research_taskset_full_filtered.json \
+        --out deep_research_taskset_answerable.json --top-k 3
+"""
+import argparse
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from hud_controller import jsonio
+from hud_controller.budget import DETAIL_FULL, DETAIL_LEVELS, FetchSize, fixed_size
+from hud_controller.exa_search import exa_search, is_search_hit
+from hud_controller.fetch_pipeline import FetchError, FetchPipeline, format_fetch_result
+from hud_controller.scoring import answer_matches
+from task_loader import iter_tasks, task_expected_answer, task_question, write_tasks
+
+SNIPPET_CHARS = 80  # Context kept on each side of a match
+
+# Report statuses; only UNANSWERABLE tasks are dropped
+ANSWERABLE = "answerable"
+UNANSWERABLE = "unanswerable"
+UNCHECKED = "unchecked"
+
+
+def find_evidence(text: str, expected: str) -> Dict[str, Any]:
+    """Location of the expected answer in text, with some surrounding context."""
+    offset = text.lower().find(expected.strip().lower())
+    start = max(0, offset - SNIPPET_CHARS)
+    end = offset + len(expected.strip()) + SNIPPET_CHARS
+    return {"offset": offset, "snippet": text[start:end]}
+
+
+async def fetch_page(pipeline: FetchPipeline, url: str, size: FetchSize) -> Tuple[Optional[str], Optional[str]]:
+    """(page, None) with the page as the fetch tool would return it, or (None, error) if the fetch failed."""
+    try:
+        result, _ = await pipeline.fetch(url, size)
+    except FetchError as e:
+        return None, str(e)
+    except Exception as e:
+        # Same catch-all as the server's fetch tool, e.g. httpx.InvalidURL
+        return None, f"{type(e).__name__} - {e}"
+    return format_fetch_result(result, size), None
+
+
+async def check_task(pipeline: FetchPipeline, exa_api_key: str, task: Dict[str, Any], top_k: int,
+                     size: FetchSize, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    """Search the task's question, fetch the top-k URLs and record where the answer appears."""
+    question = task_question(task)
+    expected = task_expected_answer(task)
+    async with semaphore:
+        results = await exa_search(question, top_k, exa_api_key)
+        urls = [result["url"] for result in results if "url" in result]
+        fetched = await asyncio.gather(*(fetch_page(pipeline, url, size) for url in urls))
+    pages = [page for page, _ in fetched]
+
+    evidence: List[Dict[str, Any]] = []
+    for rank, result in enumerate(results):
+        title = result.get("title", "")
+        if "url" in result and answer_matches(title, expected):
+            evidence.append({"url": result["url"], "rank": rank, "source": "title", **find_evidence(title, expected)})
+    for rank, (url, page) in enumerate(zip(urls, pages)):
+        if page is not None and answer_matches(page, expected):
+            evidence.append({"url": url, "rank": rank, "source": "fetch", **find_evidence(page, expected)})
+
+    search_error = results[0].get("error") if results and not is_search_hit(results) else None
+    failed_fetches = [{"url": url, "error": error} for url, (page, error) in zip(urls, fetched) if page is None]
+    if evidence:
+        status = ANSWERABLE
+    elif search_error or failed_fetches:
+        # Rate limits, open breakers or broken URLs say nothing about the task itself
+        status = UNCHECKED
+    else:
+        status = UNANSWERABLE
+
+    return {
+        "id": task.get("id"),
+        "question": question,
+        "expected_answer": expected,
+        "status": status,
+        "answerable": status == ANSWERABLE,
+        "urls": urls,
+        "failed_fetches": failed_fetches,
+        "search_error": search_error,
+        "evidence": evidence,
+    }
+
+
+async def precheck(tasks_path: str, top_k: int, max_length: int, concurrency: int,
+                   detail: str = DETAIL_FULL):
+    """Check every task in the file; returns (tasks, reports) in file order."""
+    exa_api_key = os.getenv("EXA_API_KEY")
+    if not exa_api_key:
+        raise SystemExit("Please set EXA_API_KEY environment variable")
+
+    pipeline = FetchPipeline(exa_api_key)
+    size = fixed_size(max_length, detail)
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = list(iter_tasks(tasks_path))
+    reports = await asyncio.gather(
+        *(check_task(pipeline, exa_api_key, task, top_k, size, semaphore) for task in tasks)
+    )
+    return tasks, reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drop tasks whose answer never appears in retrieved content")
+    parser.add_argument("tasks", help="Task file (JSON array)")
+    parser.add_argument("--out", required=True, help="Filtered task file to write")
+    parser.add_argument("--evidence", default=None, help="Per-task evidence file (default: <out>.evidence.json)")
+    parser.add_argument("--top-k", type=int, default=3, help="Search results to fetch per task")
+    parser.add_argument("--max-length", type=int, default=2500, help="Characters kept per fetched page")
+    parser.add_argument("--detail", choices=DETAIL_LEVELS, default=DETAIL_FULL,
+                        help="Fetch detail level, as the server's DEEPRESEARCH_FETCH_DETAIL")
+    parser.add_argument("--concurrency", type=int, default=8, help="Tasks checked at once")
+    args = parser.parse_args()
+
+    load_dotenv()
+    tasks, reports = asyncio.run(precheck(args.tasks, args.top_k, args.max_length, args.concurrency, args.detail))
+
+    kept = write_tasks(
+        (task for task, report in zip(tasks, reports) if report["status"] != UNANSWERABLE), args.out
+    )
+    unchecked = sum(report["status"] == UNCHECKED for report in reports)
+    evidence_path = args.evidence or f"{args.out.removesuffix('.json')}.evidence.json"
+    with open(evidence_path, "w", encoding="utf-8") as f:
+        jsonio.dump(reports, f, compact=False)
+
+    print(f"✅ Kept {kept} of {len(tasks)} tasks ({len(tasks) - kept} never show the answer)")
+    if unchecked:
+        print(f"⚠️  {unchecked} kept tasks could not be fully checked (search or fetch errors); "
+              f"see 'unchecked' in the evidence file")
+    print(f"✅ Filtered tasks saved to {args.out}")
+    print(f"✅ Evidence saved to {evidence_path}")
+
+
+if __name__ == "__main__":
+    main()
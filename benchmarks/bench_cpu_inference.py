@@ -0,0 +1,99 @@
+"""
+Benchmark: fp32 vs dynamic int8 CPU inference with inference.load_model.
+
+Each mode runs in its own subprocess so peak RSS is measured per mode. Reports model
+load time, peak RSS, and decode throughput (generated tokens / generation time,
+greedy) over a fixed prompt set: the first --prompts questions of the task file.
+
+Usage (after `pip install -e .`, from the repo root, with CUDA hidden so the CPU path is used):
+    CUDA_VISIBLE_DEVICES= python benchmarks/bench_cpu_inference.py --model Qwen/Qwen2.5-0.5B-Instruct
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from itertools import islice
+
+# inference.py and task_loader.py live at the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ("fp32", "int8")
+
+
+def run_mode(args) -> dict:
+    """Load the model in one mode and time generation over the prompt set (child process)."""
+    import torch
+    from transformers import AutoTokenizer
+
+    from inference import load_model
+    from task_loader import iter_tasks, task_question
+
+    questions = [task_question(task) for task in islice(iter_tasks(args.tasks), args.prompts)]
+    tokenizer = AutoTokenizer.from_pretrained(args.model, trust_remote_code=True)
+
+    start = time.perf_counter()
+    model = load_model(args.model, cpu_int8=args.mode == "int8", threads=args.threads)
+    load_seconds = time.perf_counter() - start
+
+    generated = 0
+    generate_seconds = 0.0
+    for question in questions:
+        text = tokenizer.apply_chat_template(
+            [{"role": "user", "content": question}], tokenize=False, add_generation_prompt=True
+        )
+        inputs = tokenizer(text, return_tensors="pt")
+        start = time.perf_counter()
+        with torch.no_grad():
+            output = model.generate(**inputs, max_new_tokens=args.max_new_tokens, do_sample=False,
+                                    pad_token_id=tokenizer.eos_token_id)
+        generate_seconds += time.perf_counter() - start
+        generated += output.shape[1] - inputs["input_ids"].shape[1]
+
+    return {
+        "mode": args.mode,
+        "threads": torch.get_num_threads(),
+        "load_seconds": load_seconds,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "tokens": generated,
+        "tokens_per_sec": generated / generate_seconds if generate_seconds else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="Qwen/Qwen2.5-3B-Instruct")
+    parser.add_argument("--tasks", default="deep_research_taskset_full_filtered.json")
+    parser.add_argument("--prompts", type=int, default=8)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=0, help="0 = one per available core")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args)))
+        return
+
+    print(f"{args.model}: {args.prompts} prompts, {args.max_new_tokens} new tokens each, greedy")
+    results = {}
+    for mode in MODES:
+        child = subprocess.run(
+            [sys.executable, __file__, *sys.argv[1:], "--mode", mode],
+            check=True, capture_output=True, text=True,
+        )
+        results[mode] = json.loads(child.stdout.strip().splitlines()[-1])
+        r = results[mode]
+        print(f"  {mode:<5} load {r['load_seconds']:6.1f} s   peak RSS {r['peak_rss_mb']:8.0f} MB   "
+              f"{r['tokens_per_sec']:6.2f} tok/s   ({r['threads']} threads)")
+
+    fp32, int8 = results["fp32"], results["int8"]
+    if fp32["tokens_per_sec"]:
+        print(f"  int8 vs fp32: {int8['tokens_per_sec'] / fp32['tokens_per_sec']:.2f}x tokens/sec, "
+              f"{int8['peak_rss_mb'] / fp32['peak_rss_mb']:.2f}x peak RSS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: stdlib json vs hud_controller.jsonio on Exa-shaped payloads.
+
+Decode: a /contents response (text, summary, highlights, plus metadata we never read)
+and a /search response with 1000-character text snippets we drop. Encode: a
+collect_exa_responses.py-style corpus, indent=2 vs compact.
+
+Usage:
+    python benchmarks/bench_jsonio.py
+    pip install .[fast-json] && python benchmarks/bench_jsonio.py
+"""
+import json
+import random
+import string
+import timeit
+
+from hud_controller import jsonio
+
+
+def _text(n: int, rng: random.Random) -> str:
+    words = ("".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(n // 6))
+    return " ".join(words)[:n]
+
+
+def make_payloads(seed: int = 0):
+    rng = random.Random(seed)
+    result_meta = {
+        "id": "https://example.com/page",
+        "publishedDate": "2024-01-01T00:00:00.000Z",
+        "author": "Someone",
+        "score": 0.42,
+        "image": "https://example.com/image.png",
+        "favicon": "https://example.com/favicon.ico",
+    }
+    contents = {
+        "requestId": "abc",
+        "results": [{
+            **result_meta,
+            "title": "Example page",
+            "url": "https://example.com/page",
+            "text": _text(2500, rng),
+            "summary": _text(600, rng),
+            "highlights": [_text(700, rng) for _ in range(3)],
+            "highlightScores": [0.5, 0.4, 0.3],
+        }],
+        "statuses": [{"id": "https://example.com/page", "status": "success"}],
+        "costDollars": {"total": 0.001},
+    }
+    search = {
+        "requestId": "abc",
+        "autopromptString": "query",
+        "results": [
+            {**result_meta, "title": f"Result {i}", "url": f"https://example.com/{i}", "text": _text(1000, rng)}
+            for i in range(5)
+        ],
+    }
+    corpus = {
+        "search_responses": {f"query {i}": [{"title": f"t{j}", "url": f"https://e.com/{i}/{j}"} for j in range(5)]
+                             for i in range(200)},
+        "fetch_responses": {f"https://e.com/{i}": _text(2500, rng) for i in range(1000)},
+    }
+    return json.dumps(contents).encode(), json.dumps(search).encode(), corpus
+
+
+def bench(label: str, fn, number: int):
+    seconds = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    print(f"  {label:<40} {seconds * 1e6:10.1f} us")
+    return seconds
+
+
+def main():
+    contents, search, corpus = make_payloads()
+    print(f"backends: msgspec={'yes' if jsonio.msgspec else 'no'}, orjson={'yes' if jsonio.orjson else 'no'}")
+
+    print(f"/contents decode ({len(contents)} bytes)")
+    base = bench("json.loads", lambda: json.loads(contents), 2000)
+    fast = bench("jsonio.decode_results", lambda: jsonio.decode_results(
+        contents, ("url", "text", "summary", "highlights"), ("statuses",)), 2000)
+    print(f"  speedup {base / fast:.2f}x")
+
+    print(f"/search decode ({len(search)} bytes)")
+    base = bench("json.loads", lambda: json.loads(search), 2000)
+    fast = bench("jsonio.decode_results", lambda: jsonio.decode_results(
+        search, ("title", "url"), ("autopromptString",)), 2000)
+    print(f"  speedup {base / fast:.2f}x")
+
+    print("corpus encode")
+    base = bench("json.dumps(indent=2)", lambda: json.dumps(corpus, indent=2), 20)
+    fast = bench("jsonio.dumps(compact=True)", lambda: jsonio.dumps(corpus), 20)
+    print(f"  speedup {base / fast:.2f}x, size {len(json.dumps(corpus, indent=2))} -> {len(jsonio.dumps(corpus))} chars")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: time to first token with and without the shared system-prompt prefix cache.
+
+Formats every task in the task file the way inference.run_episodes does for its first
+turn (system prompt + tool schemas + question), then times generate() with
+max_new_tokens=1 per batch: once prefilling the whole prompt, once reusing a
+PrefixCache built for the shared system turn. The one-off cost of building the
+prefix cache is reported separately.
+
+Usage (after `pip install -e .`, from the repo root):
+    python benchmarks/bench_prefix_cache.py --model Qwen/Qwen2.5-3B-Instruct --batch-size 8
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# inference.py and task_loader.py live at the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from transformers import AutoTokenizer
+
+from inference import TOOLS, PrefixCache, load_model
+from task_loader import iter_tasks
+
+
+def first_turn(tokenizer, task: dict) -> str:
+    messages = []
+    if task.get("system_prompt"):
+        messages.append({"role": "system", "content": task["system_prompt"]})
+    messages.append({"role": "user", "content": task["prompt"]})
+    return tokenizer.apply_chat_template(messages, tools=TOOLS, tokenize=False, add_generation_prompt=True)
+
+
+def time_first_token(model, tokenizer, make_inputs) -> float:
+    """Time building the inputs (tokenizing, copying the prefix cache) plus a one-token generate."""
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    inputs = make_inputs()
+    with torch.no_grad():
+        model.generate(**inputs, max_new_tokens=1, do_sample=False, pad_token_id=tokenizer.pad_token_id)
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="Qwen/Qwen2.5-3B-Instruct")
+    parser.add_argument("--tasks", default="deep_research_taskset_full_filtered.json")
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model, trust_remote_code=True)
+    tokenizer.padding_side = "left"
+    model = load_model(args.model)
+
+    tasks = list(iter_tasks(args.tasks))
+    texts = [first_turn(tokenizer, task) for task in tasks]
+    batches = [texts[start:start + args.batch_size] for start in range(0, len(texts), args.batch_size)]
+
+    start = time.perf_counter()
+    prefix = PrefixCache.for_system_prompt(model, tokenizer, tasks[0]["system_prompt"])
+    build_seconds = time.perf_counter() - start
+    covered = sum(prefix.covers([text]) for text in texts)
+
+    # Warm up kernels and allocator so the first timed batch isn't penalized
+    def full_inputs(batch):
+        return tokenizer(batch, return_tensors="pt", padding=True).to(model.device)
+
+    time_first_token(model, tokenizer, lambda: full_inputs(batches[0]))
+
+    # Only batches where every prompt shares the prefix are compared
+    full, cached = [], []
+    for batch in batches:
+        if not prefix.covers(batch):
+            continue
+        full.append(time_first_token(model, tokenizer, lambda: full_inputs(batch)))
+        # prefix.inputs deep-copies and repeats the cached KV, so it belongs in the timed region
+        cached.append(time_first_token(model, tokenizer, lambda: prefix.inputs(tokenizer, batch)))
+    if not cached:
+        raise SystemExit("No batch shares the first task's system prompt")
+
+    prompt_tokens = statistics.mean(len(tokenizer(text)["input_ids"]) for text in texts)
+    print(f"{args.model}: {len(texts)} prompts in {len(batches)} batches of {args.batch_size}")
+    print(f"  prefix: {prefix.ids.shape[1]} tokens of ~{prompt_tokens:.0f} per prompt, "
+          f"shared by {covered}/{len(texts)} prompts, built once in {build_seconds * 1000:.1f} ms")
+    print(f"  full prefill     TTFT per batch {statistics.mean(full) * 1000:8.1f} ms   total {sum(full):7.2f} s")
+    print(f"  prefix cached    TTFT per batch {statistics.mean(cached) * 1000:8.1f} ms   total {sum(cached):7.2f} s")
+    print(f"  saved {sum(full) - sum(cached) - build_seconds:.2f} s over {len(cached)} batches "
+          f"({sum(full) / (sum(cached) + build_seconds):.2f}x, build cost included)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: event-loop blocking from context stat updates, direct proxy vs StatsBuffer.
+
+Simulates many concurrent tool calls that each record a stat update. The context proxy
+is replaced by an in-process object whose methods sleep for a fixed IPC latency, like a
+synchronous round trip over /tmp/hud_ctx.sock. A monitor task measures how late the
+event loop wakes it up.
+
+Usage (after `pip install -e .`):
+    python benchmarks/bench_stats_buffer.py --calls 2000 --concurrency 64 --ipc-ms 0.5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from hud_controller.stats import StatsBuffer
+
+
+class SlowContextProxy:
+    """Stands in for the attach_context proxy: every call costs one blocking round trip."""
+
+    def __init__(self, ipc_latency: float):
+        self.ipc_latency = ipc_latency
+        self.search_count = 0
+        self.round_trips = 0
+
+    def _round_trip(self):
+        self.round_trips += 1
+        time.sleep(self.ipc_latency)
+
+    def add_search(self, query, results):
+        self._round_trip()
+        self.search_count += 1
+
+    def apply_updates(self, updates):
+        self._round_trip()
+        self.search_count += updates.get("searches", 0)
+
+    def get_stats(self):
+        self._round_trip()
+        return {"search_count": self.search_count}
+
+    def reset_stats(self):
+        self._round_trip()
+        self.search_count = 0
+
+
+async def monitor_lag(stop: asyncio.Event, lags: list, interval: float = 0.001):
+    """Record how much later than requested the loop resumes a sleeping task."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run(mode: str, calls: int, concurrency: int, ipc_latency: float) -> dict:
+    proxy = SlowContextProxy(ipc_latency)
+    buffer = StatsBuffer(proxy)
+    record = proxy.add_search if mode == "direct" else buffer.add_search
+
+    lags: list = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_lag(stop, lags))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def tool_call(i: int):
+        async with semaphore:
+            await asyncio.sleep(0)  # Stand-in for the awaited upstream request
+            record(f"query {i}", [{"title": "t", "url": "u"}])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(tool_call(i) for i in range(calls)))
+    count = (await buffer.get_stats())["search_count"] if mode == "buffered" else proxy.search_count
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await monitor
+    assert count == calls, f"lost updates: {count} != {calls}"
+    return {
+        "mode": mode,
+        "elapsed_s": elapsed,
+        "round_trips": proxy.round_trips,
+        "max_lag_ms": max(lags) * 1000 if lags else 0.0,
+        "mean_lag_ms": statistics.fmean(lags) * 1000 if lags else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--ipc-ms", type=float, default=0.5, help="Simulated IPC round trip")
+    args = parser.parse_args()
+
+    print(f"{args.calls} stat updates, concurrency {args.concurrency}, IPC {args.ipc_ms} ms")
+    for mode in ("direct", "buffered"):
+        result = asyncio.run(run(mode, args.calls, args.concurrency, args.ipc_ms / 1000))
+        print(
+            f"{result['mode']:>8}: {result['elapsed_s'] * 1000:8.1f} ms total, "
+            f"{result['round_trips']:5d} round trips, "
+            f"loop lag max {result['max_lag_ms']:7.2f} ms / mean {result['mean_lag_ms']:6.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 """Script to collect real Exa API responses and save them for hardcoding."""
 import asyncio
-import json
 from textexa import search, fetch
+from hud_controller import jsonio
 from datetime import datetime
 import time
 from get_prompts_simple import get_cleaned_prompts
@@ -12,6 +12,10 @@ SEARCH_QUERIES = get_cleaned_prompts("kizro/deep_research_taskset-50rows")
 FETCH_URLS = [
 ]
 
+# Indented so the corpus stays easy to read and edit by hand; set True for a smaller,
+# faster-to-write file without indentation
+COMPACT_OUTPUT = False
+
 async def collect_responses():
     """Collect all search and fetch responses."""
     responses = {
@@ -91,8 +95,8 @@ async def collect_responses():
                     break
     
     # Save to JSON file
-    with open("hardcoded_exa_responses.json", "w") as f:
-        json.dump(responses, f, indent=2)
+    with open("hardcoded_exa_responses.json", "w", encoding="utf-8") as f:
+        jsonio.dump(responses, f, compact=COMPACT_OUTPUT)
     
     print(f"\n\n✅ Saved {len(responses['search_responses'])} search responses")
     print(f"✅ Saved {len(responses['fetch_responses'])} fetch responses")
@@ -0,0 +1,129 @@
+"""
+Evaluate a vLLM-served model on a task file with adaptive episode concurrency.
+
+Same job as
+    hud eval <taskset> --agent vllm --model ... --vllm-base-url ... --group-size 16 --max-concurrent 32
+but instead of a fixed --max-concurrent, episodes are admitted by an AdaptiveLimiter
+(hud_controller/concurrency.py) driven by measured tool latency, tool errors and the
+vLLM server's waiting-request count, between --floor and --ceiling.
+
+    python hud_eval.py deep_research_taskset_full_filtered.json \
+        --model Qwen/Qwen2.5-14B-Instruct --vllm-base-url http://localhost:8000/v1 \
+        --group-size 16 --floor 8 --ceiling 64 --max-steps 5
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+from dotenv import load_dotenv
+from hud.agents import GenericOpenAIChatAgent
+from hud.datasets import Task
+from openai import AsyncOpenAI
+
+from hud_controller.concurrency import (
+    DEFAULT_CEILING,
+    DEFAULT_FLOOR,
+    DEFAULT_MAX_ERROR_RATE,
+    DEFAULT_MAX_QUEUE_DEPTH,
+    DEFAULT_TARGET_P95,
+    AdaptiveLimiter,
+    is_error_payload,
+    vllm_queue_depth,
+)
+from task_loader import load_shard
+
+
+def tool_results_failed(results) -> bool:
+    """Whether any MCP tool result in a call_tools() batch is an error, flagged or in-band."""
+    return any(is_error_payload(result) for result in results or [])
+
+
+async def run_episode(limiter: AdaptiveLimiter, client: AsyncOpenAI, model: str,
+                      task: Dict[str, Any], max_steps: int) -> float:
+    """Run one task in its own agent once a slot is free and return its reward."""
+    async with limiter.slot():
+        agent = GenericOpenAIChatAgent(openai_client=client, model_name=model)
+        # Time every tool round trip (MCP server + Exa) on this agent for the controller
+        agent.call_tools = limiter.timed(agent.call_tools, is_error=tool_results_failed)
+        try:
+            trace = await agent.run(Task(**task), max_steps=max_steps)
+        except Exception as e:
+            print(f"❌ {task.get('id')}: {type(e).__name__}: {e}")
+            return 0.0
+        return float(trace.reward or 0.0)
+
+
+async def evaluate(args) -> Dict[str, Any]:
+    tasks = list(load_shard(args.tasks))
+    client = AsyncOpenAI(base_url=args.vllm_base_url, api_key=args.vllm_api_key)
+
+    def on_change(old: int, new: int, reason: str):
+        print(f"⚙️  Concurrency {old} -> {new} ({reason})")
+
+    limiter = AdaptiveLimiter(
+        floor=args.floor,
+        ceiling=args.ceiling,
+        target_p95=args.target_p95,
+        max_error_rate=args.max_error_rate,
+        max_queue_depth=args.max_queue_depth,
+        queue_depth=lambda: vllm_queue_depth(args.vllm_base_url),
+        on_change=on_change,
+    )
+
+    episodes = [task for task in tasks for _ in range(args.group_size)]
+    print(f"Running {len(episodes)} episodes ({len(tasks)} tasks x {args.group_size}), "
+          f"concurrency {args.floor}-{args.ceiling}")
+    start = time.perf_counter()
+    rewards: List[float] = await asyncio.gather(
+        *(run_episode(limiter, client, args.model, task, args.max_steps) for task in episodes)
+    )
+    elapsed = time.perf_counter() - start
+    await limiter.stop()
+
+    per_task: Dict[str, List[float]] = {}
+    for task, reward in zip(episodes, rewards):
+        per_task.setdefault(task.get("id", task["prompt"]), []).append(reward)
+
+    return {
+        "episodes": len(episodes),
+        "mean_reward": sum(rewards) / len(rewards) if rewards else 0.0,
+        "elapsed_sec": elapsed,
+        "episodes_per_min": len(episodes) / elapsed * 60 if elapsed else 0.0,
+        "final_limit": limiter.limit,
+        "limiter": limiter.get_stats(),
+        "per_task": per_task,
+    }
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="hud eval with adaptive episode concurrency")
+    parser.add_argument("tasks", help="Task file (JSON array)")
+    parser.add_argument("--model", default="Qwen/Qwen2.5-14B-Instruct")
+    parser.add_argument("--vllm-base-url", default="http://localhost:8000/v1")
+    parser.add_argument("--vllm-api-key", default="token-abc123")
+    parser.add_argument("--group-size", type=int, default=1, help="Episodes per task")
+    parser.add_argument("--max-steps", type=int, default=5)
+    parser.add_argument("--floor", type=int, default=DEFAULT_FLOOR, help="Lowest episode concurrency")
+    parser.add_argument("--ceiling", type=int, default=DEFAULT_CEILING, help="Highest episode concurrency")
+    parser.add_argument("--target-p95", type=float, default=DEFAULT_TARGET_P95, help="Tool p95 latency target (s)")
+    parser.add_argument("--max-error-rate", type=float, default=DEFAULT_MAX_ERROR_RATE)
+    parser.add_argument("--max-queue-depth", type=int, default=DEFAULT_MAX_QUEUE_DEPTH,
+                        help="vLLM waiting requests above which concurrency backs off")
+    parser.add_argument("--output", default=None, help="Write the summary as JSON")
+    args = parser.parse_args()
+
+    summary = asyncio.run(evaluate(args))
+    print(f"\n✅ Mean reward {summary['mean_reward']:.3f} over {summary['episodes']} episodes")
+    print(f"   {summary['episodes_per_min']:.1f} episodes/min, final concurrency {summary['final_limit']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Summary saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
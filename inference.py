@@ -1,27 +1,433 @@
+"""
+Local generation with Qwen, plus a checkpoint-sweep evaluation mode.
+
+Default: answer PROMPT with the base model.
+    python inference.py
+
+Checkpoint sweep: load the base model once and score every LoRA adapter under
+checkpoints/ against a task file, hot-swapping adapters from a CPU-resident LRU.
+    python inference.py --eval-checkpoints --tasks deep_research_taskset_full_filtered.json
+
+CPU-only boxes: quantize the linear layers' weights to int8 after loading, using one
+thread per available core (see benchmarks/bench_cpu_inference.py for the numbers).
+    python inference.py --cpu-int8
+"""
+import argparse
+import asyncio
+import copy
+import glob
+import json
+import os
+import re
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, List, Optional
+
 import torch
 from transformers import AutoModelForCausalLM, AutoTokenizer
 
+from hud_controller.scoring import answer_matches
+from task_loader import load_shard, task_expected_answer
+
 # Edit this string with your prompt
 PROMPT = "When was the arxiv founded? When you have your final answer, return just the year, no other text."
 
-# Load model and tokenizer
-tokenizer = AutoTokenizer.from_pretrained("Qwen/Qwen2.5-14B-Instruct", trust_remote_code=True)
-model = AutoModelForCausalLM.from_pretrained(
-    "Qwen/Qwen2.5-3B-Instruct",
-    torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-    device_map="auto" if torch.cuda.is_available() else None,
-    trust_remote_code=True
-)
-
-# Format the prompt
-messages = [{"role": "user", "content": PROMPT}]
-text = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-
-# Generate response
-inputs = tokenizer(text, return_tensors="pt").to(model.device)
-outputs = model.generate(**inputs, max_new_tokens=512, temperature=0.7)
-response = tokenizer.decode(outputs[0][inputs['input_ids'].shape[1]:], skip_special_tokens=True)
-
-# Print result
-print(f"\nPrompt: {PROMPT}")
-print(f"\nResponse: {response}")
+TOKENIZER_NAME = "Qwen/Qwen2.5-14B-Instruct"
+MODEL_NAME = "Qwen/Qwen2.5-3B-Instruct"
+CHECKPOINT_GLOB = "checkpoints/*/adapter_config.json"
+
+# Tool schemas matching the MCP server (see hud.lock.yaml)
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "search",
+            "description": "Search the web for information and return titles and URLs.",
+            "parameters": {
+                "type": "object",
+                "properties": {"query": {"type": "string", "description": "The search query string"}},
+                "required": ["query"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "fetch",
+            "description": "Fetch and extract content from a URL.",
+            "parameters": {
+                "type": "object",
+                "properties": {"url": {"type": "string", "description": "The URL to fetch content from"}},
+                "required": ["url"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "answer",
+            "description": "Submit the final answer to the research question.",
+            "parameters": {
+                "type": "object",
+                "properties": {"final_answer": {"type": "string", "description": "The final answer"}},
+                "required": ["final_answer"],
+            },
+        },
+    },
+]
+
+TOOL_CALL_PATTERN = re.compile(r"<tool_call>\s*(\{.*?\})\s*</tool_call>", re.DOTALL)
+
+
+def available_cores() -> int:
+    """CPU cores this process may run on (respects taskset / container CPU affinity)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def load_model(model_name: str, cpu_int8: bool = False, threads: int = 0):
+    """
+    Load a causal LM in fp16 on GPU, or fp32 on CPU.
+
+    Args:
+        model_name: Hub name or local path
+        cpu_int8: On CPU, dynamically quantize nn.Linear weights to int8 (activations
+            stay float and are quantized per batch); ignored when CUDA is available
+        threads: Intra-op threads on CPU (0 = one per available core)
+    """
+    if torch.cuda.is_available():
+        return AutoModelForCausalLM.from_pretrained(
+            model_name,
+            torch_dtype=torch.float16,
+            device_map="auto",
+            trust_remote_code=True
+        )
+
+    torch.set_num_threads(threads or available_cores())
+    # safetensors checkpoints are memory-mapped; low_cpu_mem_usage skips the randomly
+    # initialized copy, so peak memory stays close to one set of weights
+    model = AutoModelForCausalLM.from_pretrained(
+        model_name,
+        torch_dtype=torch.float32,
+        low_cpu_mem_usage=True,
+        trust_remote_code=True
+    )
+    if cpu_int8:
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    model.eval()
+    return model
+
+
+class PrefixCache:
+    """
+    KV cache of a chat-template prefix shared by every prompt (system prompt + tool
+    schemas), computed once so generation only prefills each prompt's suffix.
+
+    The cache depends on the weights, so build one per model / active adapter.
+    """
+
+    def __init__(self, model, tokenizer, text: str):
+        self.text = text
+        self.ids = tokenizer(text, return_tensors="pt", add_special_tokens=False)["input_ids"].to(model.device)
+        with torch.no_grad():
+            self.cache = model(input_ids=self.ids, use_cache=True).past_key_values
+
+    @classmethod
+    def for_system_prompt(cls, model, tokenizer, system_prompt: str) -> "PrefixCache":
+        """Prefix cache for the rendered system turn, tool schemas included."""
+        text = tokenizer.apply_chat_template(
+            [{"role": "system", "content": system_prompt}], tools=TOOLS, tokenize=False
+        )
+        return cls(model, tokenizer, text)
+
+    def covers(self, texts: List[str]) -> bool:
+        return all(text.startswith(self.text) for text in texts)
+
+    def inputs(self, tokenizer, texts: List[str]) -> Dict:
+        """
+        generate() kwargs for texts that all start with the prefix: the cached prefix
+        tokens, then each suffix left-padded, so padding sits between prefix and suffix
+        and is masked out; position ids follow the attention mask, so they line up.
+        """
+        # Suffixes are tokenized on their own, so the prefix tokens match the cache exactly
+        suffixes = tokenizer(
+            [text[len(self.text):] for text in texts],
+            return_tensors="pt", padding=True, add_special_tokens=False
+        ).to(self.ids.device)
+        batch_size = len(texts)
+        prefix_ids = self.ids.expand(batch_size, -1)
+        cache = copy.deepcopy(self.cache)
+        if batch_size > 1:
+            cache.batch_repeat_interleave(batch_size)
+        return {
+            "input_ids": torch.cat([prefix_ids, suffixes["input_ids"]], dim=1),
+            "attention_mask": torch.cat([torch.ones_like(prefix_ids), suffixes["attention_mask"]], dim=1),
+            "past_key_values": cache,
+        }
+
+
+def generate_batch(model, tokenizer, texts: List[str], max_new_tokens: int, temperature: float,
+                   prefix: Optional[PrefixCache] = None) -> List[str]:
+    """Generate completions for a batch of already chat-formatted prompts, reusing prefix if all share it."""
+    if prefix is not None and prefix.covers(texts):
+        inputs = prefix.inputs(tokenizer, texts)
+    else:
+        inputs = tokenizer(texts, return_tensors="pt", padding=True).to(model.device)
+    sampling = {"do_sample": True, "temperature": temperature} if temperature > 0 else {"do_sample": False}
+    with torch.no_grad():
+        outputs = model.generate(
+            **inputs,
+            max_new_tokens=max_new_tokens,
+            pad_token_id=tokenizer.pad_token_id,
+            **sampling
+        )
+    prompt_length = inputs["input_ids"].shape[1]
+    return [tokenizer.decode(output[prompt_length:], skip_special_tokens=True) for output in outputs]
+
+
+class AdapterPool:
+    """
+    Base model wrapped with a single LoRA slot that adapters are swapped into.
+
+    Up to max_resident adapters are kept as CPU state dicts in an LRU; activating one
+    copies its weights into the slot, so switching never reloads the base model.
+    All adapters must share the slot's rank, alpha and target modules.
+    """
+
+    SLOT = "active"
+
+    def __init__(self, base_model, first_adapter_dir: str, max_resident: int):
+        from peft import LoraConfig, PeftModel
+
+        self.model = PeftModel.from_pretrained(base_model, first_adapter_dir, adapter_name=self.SLOT)
+        self.model.eval()
+        self.slot_config = LoraConfig.from_pretrained(first_adapter_dir)
+        self.max_resident = max(1, max_resident)
+        self.resident: "OrderedDict[str, Dict[str, torch.Tensor]]" = OrderedDict()
+        self.active = first_adapter_dir
+
+    def compatible(self, adapter_dir: str) -> bool:
+        """Whether an adapter can be swapped into the slot without changing its shape or scaling."""
+        from peft import LoraConfig
+
+        config = LoraConfig.from_pretrained(adapter_dir)
+        return (
+            config.r == self.slot_config.r
+            and config.lora_alpha == self.slot_config.lora_alpha
+            and set(config.target_modules) == set(self.slot_config.target_modules)
+            and config.use_dora == self.slot_config.use_dora
+            and config.use_rslora == self.slot_config.use_rslora
+        )
+
+    def _weights(self, adapter_dir: str) -> Dict[str, torch.Tensor]:
+        from peft.utils import load_peft_weights
+
+        if adapter_dir in self.resident:
+            self.resident.move_to_end(adapter_dir)
+            return self.resident[adapter_dir]
+        weights = load_peft_weights(adapter_dir, device="cpu")
+        self.resident[adapter_dir] = weights
+        while len(self.resident) > self.max_resident:
+            self.resident.popitem(last=False)
+        return weights
+
+    def activate(self, adapter_dir: str):
+        """Make adapter_dir the active adapter, loading it from disk only if it is not resident."""
+        from peft import set_peft_model_state_dict
+
+        if adapter_dir == self.active:
+            return
+        set_peft_model_state_dict(self.model, self._weights(adapter_dir), adapter_name=self.SLOT)
+        self.active = adapter_dir
+
+
+def find_adapters(pattern: str = CHECKPOINT_GLOB) -> List[str]:
+    """Adapter directories matching pattern, oldest first."""
+    configs = sorted(glob.glob(pattern), key=os.path.getmtime)
+    return [os.path.dirname(config) for config in configs]
+
+
+def parse_tool_call(text: str) -> Optional[Dict]:
+    """Parse the first Hermes-style <tool_call> in a completion."""
+    match = TOOL_CALL_PATTERN.search(text)
+    if not match:
+        return None
+    try:
+        call = json.loads(match.group(1))
+    except json.JSONDecodeError:
+        return None
+    return call if isinstance(call, dict) and "name" in call else None
+
+
+async def run_tool(name: str, arguments: Dict) -> str:
+    """Run search/fetch through the standalone Exa client used by the offline scripts."""
+    from textexa import fetch, search
+
+    if name == "search":
+        return json.dumps(await search(arguments.get("query", ""), max_results=1))
+    if name == "fetch":
+        return await fetch(arguments.get("url", ""), max_length=2500)
+    return f"Unknown tool: {name}"
+
+
+def run_episodes(model, tokenizer, tasks: List[Dict], max_steps: int,
+                 max_new_tokens: int, temperature: float,
+                 prefix: Optional[PrefixCache] = None) -> List[Optional[str]]:
+    """
+    Run one batch of tasks as tool-using episodes and return each submitted answer.
+    With prefix, every turn of every episode skips prefilling the shared system turn.
+    """
+    episodes = []
+    for task in tasks:
+        messages = []
+        if task.get("system_prompt"):
+            messages.append({"role": "system", "content": task["system_prompt"]})
+        messages.append({"role": "user", "content": task["prompt"]})
+        episodes.append({"messages": messages, "answer": None, "done": False})
+
+    for _ in range(max_steps):
+        active = [episode for episode in episodes if not episode["done"]]
+        if not active:
+            break
+        texts = [
+            tokenizer.apply_chat_template(episode["messages"], tools=TOOLS, tokenize=False, add_generation_prompt=True)
+            for episode in active
+        ]
+        completions = generate_batch(model, tokenizer, texts, max_new_tokens, temperature, prefix)
+
+        pending = []
+        for episode, completion in zip(active, completions):
+            episode["messages"].append({"role": "assistant", "content": completion})
+            call = parse_tool_call(completion)
+            if call is None:
+                episode["done"] = True
+            elif call["name"] == "answer":
+                episode["answer"] = str(call.get("arguments", {}).get("final_answer", ""))
+                episode["done"] = True
+            else:
+                pending.append((episode, call))
+
+        async def run_pending():
+            return await asyncio.gather(*(run_tool(call["name"], call.get("arguments", {})) for _, call in pending))
+
+        for (episode, _), result in zip(pending, asyncio.run(run_pending())):
+            episode["messages"].append({"role": "tool", "content": result})
+
+    return [episode["answer"] for episode in episodes]
+
+
+def eval_checkpoints(args):
+    """Score every adapter under the checkpoint glob against the task file."""
+    adapters = find_adapters(args.checkpoints)
+    if not adapters:
+        raise SystemExit(f"No adapters match {args.checkpoints}")
+    # Each worker (RANK / WORLD_SIZE) scores only its own shard of the task file
+    rank, world_size = int(os.getenv("RANK", "0")), int(os.getenv("WORLD_SIZE", "1"))
+    tasks = list(islice(load_shard(args.tasks, rank, world_size), args.limit or None))
+    if not tasks:
+        print(f"Rank {rank}/{world_size}: no tasks in this shard")
+        write_scores(args.output, rank, world_size, 0, {})
+        return
+
+    with open(os.path.join(adapters[0], "adapter_config.json")) as f:
+        base_name = args.base_model or json.load(f)["base_model_name_or_path"]
+    tokenizer = AutoTokenizer.from_pretrained(base_name, trust_remote_code=True)
+    tokenizer.padding_side = "left"  # Batched generation needs left padding
+    pool = AdapterPool(load_model(base_name, threads=args.threads), adapters[0], args.max_resident)
+
+    for adapter_dir in [adapter_dir for adapter_dir in adapters if not pool.compatible(adapter_dir)]:
+        print(f"Skipping {adapter_dir}: LoRA config differs from the loaded slot")
+        adapters.remove(adapter_dir)
+    correct = {adapter_dir: 0 for adapter_dir in adapters}
+    # Every task in the taskset shares one system prompt; batches with another fall back
+    system_prompt = None if args.no_prefix_cache else tasks[0].get("system_prompt")
+
+    # Sweep in groups that fit in the resident LRU, switching adapters per batch so each
+    # batch is formatted once and every adapter in the group sees it back to back
+    for group_start in range(0, len(adapters), pool.max_resident):
+        group = adapters[group_start:group_start + pool.max_resident]
+        prefixes: Dict[str, PrefixCache] = {}  # Per adapter: the KV depends on the weights
+        for start in range(0, len(tasks), args.batch_size):
+            batch = tasks[start:start + args.batch_size]
+            for adapter_dir in group:
+                pool.activate(adapter_dir)
+                if system_prompt and adapter_dir not in prefixes:
+                    prefixes[adapter_dir] = PrefixCache.for_system_prompt(pool.model, tokenizer, system_prompt)
+                answers = run_episodes(pool.model, tokenizer, batch, args.max_steps, args.max_new_tokens,
+                                       args.temperature, prefixes.get(adapter_dir))
+                for task, submitted in zip(batch, answers):
+                    correct[adapter_dir] += answer_matches(submitted, task_expected_answer(task))
+
+    label = f" (rank {rank}/{world_size} shard)" if world_size > 1 else ""
+    for adapter_dir in adapters:
+        name = os.path.basename(adapter_dir)
+        print(f"{name}{label}: {correct[adapter_dir]}/{len(tasks)} = {correct[adapter_dir] / len(tasks):.3f}")
+    write_scores(args.output, rank, world_size, len(tasks),
+                 {os.path.basename(adapter_dir): count for adapter_dir, count in correct.items()})
+
+
+def write_scores(output: Optional[str], rank: int, world_size: int, num_tasks: int, correct: Dict[str, int]):
+    """
+    Write per-checkpoint scores. With several workers each writes its own
+    <output>.rank<N> file with raw counts, so shards combine as sum(correct) / sum(tasks).
+    """
+    if not output:
+        return
+    if world_size > 1:
+        output = f"{output}.rank{rank}"
+        data = {"rank": rank, "world_size": world_size, "tasks": num_tasks, "correct": correct}
+    else:
+        data = {name: count / num_tasks for name, count in correct.items()}
+    with open(output, "w") as f:
+        json.dump(data, f, indent=2)
+    print(f"Scores saved to {output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Qwen inference and checkpoint evaluation")
+    parser.add_argument("--eval-checkpoints", action="store_true", help="Score every LoRA checkpoint on --tasks")
+    parser.add_argument("--tasks", default="deep_research_taskset_full_filtered.json")
+    parser.add_argument("--checkpoints", default=CHECKPOINT_GLOB, help="Glob for adapter_config.json files")
+    parser.add_argument("--base-model", default=None, help="Defaults to the first adapter's base model")
+    parser.add_argument("--max-resident", type=int, default=4, help="Adapters kept in CPU memory")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--limit", type=int, default=0, help="Only use the first N tasks (0 = all)")
+    parser.add_argument("--max-steps", type=int, default=5)
+    parser.add_argument("--max-new-tokens", type=int, default=512)
+    parser.add_argument("--temperature", type=float, default=0.0, help="0 = greedy")
+    parser.add_argument("--output", default=None,
+                        help="Write per-checkpoint scores as JSON (<output>.rank<N> per worker when sharded)")
+    parser.add_argument("--no-prefix-cache", action="store_true",
+                        help="Prefill the shared system prompt for every prompt instead of caching its KV")
+    parser.add_argument("--cpu-int8", action="store_true", help="Without CUDA, run int8-quantized linear layers")
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads (0 = one per available core)")
+    args = parser.parse_args()
+
+    if args.eval_checkpoints:
+        if args.cpu_int8:
+            # LoRA slots are nn.Linear modules that quantization would replace
+            parser.error("--cpu-int8 cannot be combined with --eval-checkpoints")
+        eval_checkpoints(args)
+        return
+
+    # Load model and tokenizer
+    tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_NAME, trust_remote_code=True)
+    model = load_model(MODEL_NAME, cpu_int8=args.cpu_int8, threads=args.threads)
+
+    # Format the prompt
+    messages = [{"role": "user", "content": PROMPT}]
+    text = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+
+    # Generate response
+    inputs = tokenizer(text, return_tensors="pt").to(model.device)
+    outputs = model.generate(**inputs, max_new_tokens=512, temperature=0.7)
+    response = tokenizer.decode(outputs[0][inputs['input_ids'].shape[1]:], skip_special_tokens=True)
+
+    # Print result
+    print(f"\nPrompt: {PROMPT}")
+    print(f"\nResponse: {response}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Pre-warm the server's response cache from a task file.
+
+The system prompt tells the agent to search for the exact question and then fetch
+the returned URLs, so the first two tool calls of most episodes are known up front.
+This runs those searches and top-URL fetches with bounded concurrency, through the
+same code and cache keys as the server, and writes a snapshot the server loads at
+startup when DEEPRESEARCH_CACHE_SNAPSHOT points at it.
+
+    python prewarm_cache.py deep_research_taskset_full_filtered.json --out /tmp/deepresearch_cache.json
+    DEEPRESEARCH_CACHE_SNAPSHOT=/tmp/deepresearch_cache.json python -m hud_controller.server
+
+For docker-run tasks, mount the file into the container and pass the variable with -e.
+Running again with the same --out keeps the existing entries and only adds new ones.
+
+With --push-context, the entries are also loaded into a running context server's
+shared response cache, so already-running servers pick them up without a restart.
+"""
+import argparse
+import asyncio
+import os
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from hud_controller.budget import DETAIL_FULL, DETAIL_LEVELS, fixed_size
+from hud_controller.cache import load_snapshot, save_snapshot
+from hud_controller.exa_search import exa_search, is_search_hit, search_signature
+from hud_controller.fetch_pipeline import FetchError, FetchPipeline
+from task_loader import iter_tasks, task_question
+
+DEFAULT_SNAPSHOT = "/tmp/deepresearch_cache.json"
+DEFAULT_MAX_RESULTS = 5  # max_results the search action passes in configs/deepresearch.yaml
+PUSH_BATCH = 256  # Entries per call to the context server
+
+
+def push_to_context(socket_path: str, searches: List[Dict], fetches: List[Dict]):
+    """Load snapshot entries into the context's shared cache under the server's keys."""
+    from hud.server.context import attach_context
+
+    ctx = attach_context(socket_path)
+    entries = [(("search", entry["signature"], entry["max_results"]), entry["results"]) for entry in searches]
+    entries += [(("fetch", entry["key"]), {"result": entry["result"], "size": entry["size"]}) for entry in fetches]
+    for start in range(0, len(entries), PUSH_BATCH):
+        ctx.cache_put_many(entries[start:start + PUSH_BATCH])
+    stats = ctx.cache_stats()
+    print(f"✅ Pushed {len(entries)} entries to {socket_path} "
+          f"({stats['entries']} cached, {stats['bytes'] / 1e6:.1f} MB)")
+
+
+async def prewarm(tasks_path: str, out_path: str, max_results: int, fetch_top: int,
+                  max_length: int, concurrency: int, detail: str = DETAIL_FULL,
+                  push_socket: Optional[str] = None):
+    exa_api_key = os.getenv("EXA_API_KEY")
+    if not exa_api_key:
+        raise SystemExit("Please set EXA_API_KEY environment variable")
+
+    existing = load_snapshot(out_path)
+    searches = {(entry["signature"], entry["max_results"]): entry for entry in existing["search"]}
+    pipeline = FetchPipeline(exa_api_key, cache_size=1 << 20)
+    pipeline.import_cache(existing["fetch"])
+    size = fixed_size(max_length, detail)
+    semaphore = asyncio.Semaphore(concurrency)
+    counts = {"searched": 0, "fetched": 0, "failed": 0, "skipped": 0}
+
+    async def warm(question: str):
+        key = (search_signature(question), max_results)
+        async with semaphore:
+            if key in searches:
+                counts["skipped"] += 1
+                results = searches[key]["results"]
+            else:
+                results = await exa_search(question, max_results, exa_api_key)
+                if not is_search_hit(results):
+                    counts["failed"] += 1
+                    return
+                searches[key] = {"signature": key[0], "max_results": max_results, "results": results}
+                counts["searched"] += 1
+
+        async def warm_fetch(url: str):
+            async with semaphore:
+                try:
+                    _, source = await pipeline.fetch(url, size)
+                except FetchError:
+                    counts["failed"] += 1
+                    return
+            if source in ("exa", "direct"):
+                counts["fetched"] += 1
+
+        await asyncio.gather(*(warm_fetch(result["url"]) for result in results[:fetch_top]))
+
+    # Identical questions in the task file collapse onto one search entry
+    questions = {task_question(task) for task in iter_tasks(tasks_path)}
+    print(f"Warming {len(questions)} questions (concurrency {concurrency})...")
+    await asyncio.gather(*(warm(question) for question in questions))
+
+    fetches = pipeline.export_cache()
+    save_snapshot(out_path, list(searches.values()), fetches)
+    print(f"✅ {counts['searched']} searches and {counts['fetched']} fetches sent, "
+          f"{counts['skipped']} already cached, {counts['failed']} failed")
+    print(f"✅ Snapshot saved to {out_path} ({len(searches)} searches, {len(pipeline.cache)} pages)")
+
+    if push_socket:
+        push_to_context(push_socket, list(searches.values()), fetches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-warm the server response cache from a task file")
+    parser.add_argument("tasks", help="Task file (JSON array)")
+    parser.add_argument("--out", default=DEFAULT_SNAPSHOT, help="Snapshot file to write")
+    parser.add_argument("--max-results", type=int, default=DEFAULT_MAX_RESULTS,
+                        help="Results per search; covers any search with max_results up to this")
+    parser.add_argument("--fetch-top", type=int, default=1, help="Top result URLs to fetch per question")
+    parser.add_argument("--max-length", type=int, default=2500,
+                        help="Text characters to fetch; covers any fetch with max_length up to this")
+    parser.add_argument("--detail", choices=DETAIL_LEVELS, default=DETAIL_FULL,
+                        help="Fetch detail level; a cached 'full' entry also serves cheaper levels")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--push-context", default=None, metavar="SOCKET",
+                        help="Also load the entries into the context server on this socket, "
+                             "e.g. /tmp/hud_ctx.sock")
+    args = parser.parse_args()
+
+    load_dotenv()
+    asyncio.run(prewarm(args.tasks, args.out, args.max_results, args.fetch_top, args.max_length, args.concurrency,
+                        args.detail, args.push_context))
+
+
+if __name__ == "__main__":
+    main()
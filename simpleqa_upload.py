@@ -4,19 +4,19 @@ Convert Hugging Face dataset basicv8vc/SimpleQA (split: test)
 into DeepResearch 'tasks' format and save with hud.datasets.save_tasks.
 """
 
-import json
 import uuid
 from typing import List, Dict
 
 from datasets import load_dataset
 from hud.datasets import save_tasks
+from hud_controller import jsonio
 
 
 def load_system_prompt():
     """Load system prompt from deepresearch_rl_config.json"""
     try:
         with open("deepresearch_rl_config.json", "r") as f:
-            config = json.load(f)
+            config = jsonio.load(f)
             return config.get("actor", {}).get("system_prompt", "")
     except Exception as e:
         print(f"Warning: Could not load system prompt: {e}")
@@ -0,0 +1,118 @@
+"""Context-budget-aware sizing for fetch responses."""
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+# Rough conversion used for budgeting; Qwen tokenizers average ~4 chars/token on web text
+CHARS_PER_TOKEN = 4
+
+# Defaults mirror the vLLM / RL settings we run with (--max-model-len, max_new_tokens, max_steps)
+DEFAULT_MAX_MODEL_LEN = 32768
+DEFAULT_MAX_NEW_TOKENS = 4096
+DEFAULT_MAX_TURNS = 5
+
+PROMPT_OVERHEAD_TOKENS = 512  # System prompt + question + chat template
+GENERATED_TOKENS_PER_TURN = 256  # Typical tool-call turn length, not the max
+
+SUMMARY_CHARS = 600  # Approximate size of a "main takeaways" summary
+HIGHLIGHT_CHARS = 700  # Approximate size of one 5-sentence highlight
+MIN_TEXT_CHARS = 500
+MAX_TEXT_CHARS = 12000
+
+# Fetch detail levels, cheapest first; summaries are generated per request and cost the most
+DETAIL_TEXT = "text"
+DETAIL_HIGHLIGHTS = "highlights"
+DETAIL_FULL = "full"
+DETAIL_LEVELS = (DETAIL_TEXT, DETAIL_HIGHLIGHTS, DETAIL_FULL)
+
+
+@dataclass(frozen=True)
+class FetchSize:
+    """How much of a page a single fetch should return."""
+    summary: bool
+    highlights: int
+    text_chars: int
+
+    @property
+    def detail(self) -> str:
+        """The detail level this size falls in, used to report latency per tier."""
+        if self.summary:
+            return DETAIL_FULL
+        return DETAIL_HIGHLIGHTS if self.highlights else DETAIL_TEXT
+
+
+def fixed_size(max_length: int, detail: str = DETAIL_FULL) -> FetchSize:
+    """
+    Non-adaptive sizing: up to max_length characters of text, plus 3 highlights at the
+    'highlights' level and a summary as well at the 'full' level.
+
+    Raises:
+        ValueError: If detail is not one of DETAIL_LEVELS
+    """
+    if detail not in DETAIL_LEVELS:
+        raise ValueError(f"Unknown detail level {detail!r}, expected one of {', '.join(DETAIL_LEVELS)}")
+    return FetchSize(
+        summary=detail == DETAIL_FULL,
+        highlights=3 if detail != DETAIL_TEXT else 0,
+        text_chars=max(1, max_length),
+    )
+
+
+def missing_parts(cached: Optional[FetchSize], cached_text_complete: bool, size: FetchSize) -> FetchSize:
+    """
+    The parts of size that a cached entry does not already cover; text_chars of 0 means
+    no text is needed. With nothing cached, that is all of size.
+    """
+    if cached is None:
+        return size
+    text_covered = cached.text_chars >= size.text_chars or cached_text_complete
+    return FetchSize(
+        summary=size.summary and not cached.summary,
+        highlights=size.highlights if size.highlights > cached.highlights else 0,
+        text_chars=0 if text_covered else size.text_chars,
+    )
+
+
+def size_fetch(budget: Dict[str, int]) -> FetchSize:
+    """
+    Decide how much summary, highlights and text a fetch may return given the episode budget.
+
+    Args:
+        budget: Episode budget state with 'max_model_len', 'max_new_tokens', 'max_turns',
+            'turns_used' and 'context_chars' (characters already returned to the agent)
+
+    Returns:
+        FetchSize for this call
+    """
+    max_model_len = budget.get("max_model_len") or DEFAULT_MAX_MODEL_LEN
+    max_new_tokens = budget.get("max_new_tokens") or DEFAULT_MAX_NEW_TOKENS
+    max_turns = budget.get("max_turns") or DEFAULT_MAX_TURNS
+    turns_used = budget.get("turns_used", 0)
+    context_chars = budget.get("context_chars", 0)
+
+    # Every request to the model needs max_new_tokens of headroom, so that is never available
+    used_tokens = (
+        PROMPT_OVERHEAD_TOKENS
+        + context_chars // CHARS_PER_TOKEN
+        + turns_used * GENERATED_TOKENS_PER_TURN
+    )
+    available_tokens = max_model_len - max_new_tokens - used_tokens
+
+    # Keep the last turn for answer(); split what is left across the remaining tool turns
+    tool_turns_left = max(1, max_turns - turns_used - 1)
+    share_chars = max(0, available_tokens) * CHARS_PER_TOKEN // tool_turns_left
+
+    if share_chars < 1500:
+        # Tight budget: raw text only, and never less than a useful minimum
+        return FetchSize(summary=False, highlights=0, text_chars=max(MIN_TEXT_CHARS, share_chars))
+    if share_chars < 3500:
+        # Highlights tier: skip the summary, which is the slowest part to generate
+        return FetchSize(
+            summary=False,
+            highlights=2,
+            text_chars=max(MIN_TEXT_CHARS, share_chars - 2 * HIGHLIGHT_CHARS),
+        )
+    return FetchSize(
+        summary=True,
+        highlights=3,
+        text_chars=min(MAX_TEXT_CHARS, share_chars - SUMMARY_CHARS - 3 * HIGHLIGHT_CHARS),
+    )
@@ -0,0 +1,173 @@
+"""Response caches, request coalescing and cache snapshots shared by the tools."""
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from hud_controller import jsonio
+
+SNAPSHOT_VERSION = 2  # Bumped when cache keys change, so stale snapshots are ignored
+
+
+class LRUCache:
+    """Bounded least-recently-used mapping."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if key not in self._data:
+            return None
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def put(self, key: Hashable, value: Any):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        """Entries from least to most recently used."""
+        return iter(list(self._data.items()))
+
+
+class SharedResponseCache:
+    """
+    LRU bounded by the encoded size of its values, hosted in the context process so
+    cached responses outlive server reloads and are shared by every server attached
+    to the same context socket. Keys and values must be picklable, and values
+    JSON-encodable: an entry's size is the length of its JSON encoding.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        # The context server handles each client connection on its own thread
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "puts": 0, "evictions": 0, "rejected": 0}
+
+    def get_many(self, keys: List[Hashable]) -> List[Optional[Any]]:
+        """Values for keys in order, None for each miss."""
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    self.counters["misses"] += 1
+                    values.append(None)
+                    continue
+                self._data.move_to_end(key)
+                self.counters["hits"] += 1
+                values.append(entry[0])
+        return values
+
+    def put_many(self, entries: List[Tuple[Hashable, Any]]):
+        """Insert or replace entries, evicting least recently used ones to stay under max_bytes."""
+        # Sizes are measured outside the lock; encoding is the slow part
+        sized = [(key, value, len(jsonio.dumps(value))) for key, value in entries]
+        with self._lock:
+            for key, value, nbytes in sized:
+                if nbytes > self.max_bytes:
+                    self.counters["rejected"] += 1
+                    continue
+                old = self._data.pop(key, None)
+                if old is not None:
+                    self._bytes -= old[1]
+                self._data[key] = (value, nbytes)
+                self._bytes += nbytes
+                self.counters["puts"] += 1
+            while self._bytes > self.max_bytes:
+                _, (_, nbytes) = self._data.popitem(last=False)
+                self._bytes -= nbytes
+                self.counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count, bytes used and hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+                **self.counters,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run fn for key, or wait for the call already running for it.
+
+        Returns:
+            (result, shared) where shared is True if another caller's call was reused
+        """
+        while key in self._inflight:
+            future = self._inflight[key]
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The caller running it was cancelled; run it ourselves
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved in case nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._inflight[key]
+
+
+def save_snapshot(path: str, search: List[Dict[str, Any]], fetch: List[Dict[str, Any]]):
+    """
+    Write search and fetch cache entries to a snapshot file the server loads at startup.
+
+    Args:
+        path: Snapshot file to write (replaced atomically)
+        search: Entries with 'signature', 'max_results' and 'results'
+        fetch: Entries with 'key', 'size' and 'result'
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        jsonio.dump({"version": SNAPSHOT_VERSION, "search": search, "fetch": fetch}, f)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Read a snapshot written by save_snapshot; a missing or outdated file is empty."""
+    if not os.path.exists(path):
+        return {"search": [], "fetch": []}
+    with open(path, "r", encoding="utf-8") as f:
+        snapshot = jsonio.load(f)
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        return {"search": [], "fetch": []}
+    return snapshot
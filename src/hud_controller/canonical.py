@@ -0,0 +1,147 @@
+"""Query and URL canonicalization so equivalent tool calls share upstream responses."""
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import FrozenSet, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+# Instructions appended to task prompts that say nothing about what to search for
+QUERY_SUFFIXES = (
+    "return just the answer, no other text.",
+    "return just the answer.",
+    "when you have your final answer, return just the year, no other text.",
+)
+
+# Query parameters that only track the visitor and never change page content
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid",
+    "ref_src", "ref_url", "_ga", "_gl", "yclid", "spm",
+}
+TRACKING_PREFIXES = ("utm_",)
+
+NEAR_DUPLICATE_WINDOW = 1024  # Recent query signatures kept for near-duplicate matching
+REDIRECT_MAP_SIZE = 4096
+
+# Stripped from token edges only, so "C++", "C#" and "9/11" keep their symbols
+_EDGE_PUNCTUATION = "?.,!:;\"'()[]"
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, strip answer-format suffixes and punctuation at word edges, and collapse whitespace."""
+    text = unicodedata.normalize("NFKC", query).lower().strip()
+    stripped = True
+    while stripped:
+        stripped = False
+        for suffix in QUERY_SUFFIXES:
+            if text.endswith(suffix):
+                text = text[:-len(suffix)].strip()
+                stripped = True
+    tokens = (token.strip(_EDGE_PUNCTUATION) for token in text.split())
+    return " ".join(token for token in tokens if token)
+
+
+def query_tokens(query: str) -> FrozenSet[str]:
+    """Token set of a normalized query; word order and repeats do not matter."""
+    return frozenset(normalize_query(query).split())
+
+
+def query_signature(query: str) -> str:
+    """Order-insensitive signature used as the search cache key."""
+    return " ".join(sorted(query_tokens(query)))
+
+
+class NearDuplicateIndex:
+    """Finds a recent query whose token set is within a Jaccard threshold of a new one."""
+
+    def __init__(self, threshold: float, window: int = NEAR_DUPLICATE_WINDOW):
+        self.threshold = threshold
+        self.window = window
+        self._recent: "OrderedDict[str, FrozenSet[str]]" = OrderedDict()
+
+    def add(self, signature: str, tokens: FrozenSet[str]):
+        self._recent[signature] = tokens
+        self._recent.move_to_end(signature)
+        while len(self._recent) > self.window:
+            self._recent.popitem(last=False)
+
+    def find(self, tokens: FrozenSet[str]) -> Optional[str]:
+        """Return the signature of the closest recent query at or above the threshold."""
+        if not tokens or self.threshold <= 0:
+            return None
+        best, best_score = None, self.threshold
+        for signature, other in self._recent.items():
+            score = len(tokens & other) / len(tokens | other)
+            if score >= best_score:
+                best, best_score = signature, score
+        return best
+
+
+def canonical_url(url: str) -> str:
+    """
+    Canonical cache key for a URL.
+
+    Scheme and host are lowercased, http becomes https, a leading 'www.' and default
+    ports are dropped, tracking parameters and the fragment are removed, the remaining
+    parameters are sorted and a trailing slash is dropped. The key is only used to
+    share responses; requests still go to the URL the agent asked for.
+    """
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    if scheme == "http":
+        scheme = "https"
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parsed.port and parsed.port not in (80, 443):
+        host = f"{host}:{parsed.port}"
+
+    path = re.sub(r"/{2,}", "/", parsed.path or "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    params = [
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ]
+    query = urlencode(sorted(params))
+    return urlunparse((scheme, host, path, "", query, ""))
+
+
+class RedirectMap:
+    """Learned canonical-URL redirects, so a URL and its redirect target share one entry."""
+
+    def __init__(self, max_size: int = REDIRECT_MAP_SIZE):
+        self.max_size = max_size
+        self._targets: "OrderedDict[str, str]" = OrderedDict()
+
+    def learn(self, source: str, target: str):
+        """Record that canonical URL source redirects to canonical URL target."""
+        if source == target:
+            return
+        self._targets[source] = target
+        self._targets.move_to_end(source)
+        while len(self._targets) > self.max_size:
+            self._targets.popitem(last=False)
+
+    def resolve(self, key: str) -> str:
+        """Follow learned redirects from a canonical URL, guarding against loops."""
+        seen = {key}
+        while key in self._targets:
+            key = self._targets[key]
+            if key in seen:
+                break
+            seen.add(key)
+        return key
+
+
+def url_key(url: str, redirects: Optional[RedirectMap] = None) -> Tuple[str, bool]:
+    """
+    Cache key for a URL after canonicalization and learned redirects.
+
+    Returns:
+        (key, rewritten) where rewritten says whether the key differs from the raw URL
+    """
+    key = canonical_url(url)
+    if redirects is not None:
+        key = redirects.resolve(key)
+    return key, key != url
@@ -0,0 +1,298 @@
+"""
+Adaptive episode concurrency for rollout drivers.
+
+A fixed max_parallel_episodes / --max-concurrent is either too low (vLLM idles) or
+too high (Exa 429s and long tool tails). AdaptiveLimiter admits episodes up to a
+limit that a feedback loop moves between a floor and a ceiling:
+
+- back off multiplicatively when tool p95 latency, the upstream error rate or the
+  model server's waiting-request count goes over its target
+- grow additively when none of them is over target and the limit was actually
+  reached in the last interval (otherwise more slots would not be used)
+
+Drivers feed it tool timings with record() and admit episodes with slot() or wrap().
+"""
+import asyncio
+import inspect
+import json
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+import httpx
+
+DEFAULT_FLOOR = 4
+DEFAULT_CEILING = 64
+DEFAULT_TARGET_P95 = 15.0  # Seconds per tool call
+DEFAULT_MAX_ERROR_RATE = 0.05
+DEFAULT_MAX_QUEUE_DEPTH = 8  # vLLM requests waiting for a batch slot
+ADJUST_INTERVAL = 5.0
+SAMPLE_WINDOW = 60.0  # Seconds of tool samples considered
+MIN_SAMPLES = 10  # Fewer samples than this are not enough to judge latency or errors
+BACKOFF = 0.75
+STEP = 2
+
+QUEUE_METRIC = "vllm:num_requests_waiting"
+
+# Leading text of the error strings the MCP tools return instead of raising
+ERROR_PREFIXES = ("Fetch failed", "Search failed", "Exa API", "Invalid Exa API key", "Episode time budget exhausted")
+
+
+def is_error_payload(result: Any) -> bool:
+    """
+    Whether a tool result reports a failure in-band.
+
+    The search and fetch tools return errors as payloads rather than raising: search
+    results with an "error" key, fetch text starting with "Fetch failed: ...". Walks MCP
+    results (isError / content / text), message dicts and lists, and JSON-encoded text.
+    """
+    if result is None:
+        return False
+    if getattr(result, "isError", False):
+        return True
+    if isinstance(result, str):
+        text = result.lstrip()
+        if text.startswith(ERROR_PREFIXES):
+            return True
+        if text[:1] in "[{":
+            try:
+                return is_error_payload(json.loads(text))
+            except ValueError:
+                return False
+        return False
+    if isinstance(result, dict):
+        return "error" in result or is_error_payload(result.get("content"))
+    if isinstance(result, (list, tuple)):
+        return any(is_error_payload(item) for item in result)
+    for attr in ("content", "text"):
+        if hasattr(result, attr):
+            return is_error_payload(getattr(result, attr))
+    return False
+
+
+async def vllm_queue_depth(base_url: str, timeout: float = 2.0) -> Optional[int]:
+    """
+    Requests waiting in a vLLM server's scheduler queue, read from its /metrics endpoint.
+
+    Args:
+        base_url: OpenAI-compatible base URL, e.g. http://localhost:8000/v1
+        timeout: Seconds to wait for the metrics page
+
+    Returns:
+        The waiting-request count summed over engines, or None if it could not be read
+    """
+    metrics_url = base_url.rstrip("/").removesuffix("/v1") + "/metrics"
+    try:
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            response = await client.get(metrics_url)
+            response.raise_for_status()
+    except httpx.HTTPError:
+        return None
+
+    total, found = 0.0, False
+    for line in response.text.splitlines():
+        if line.startswith(QUEUE_METRIC):
+            total += float(line.rsplit(" ", 1)[1])
+            found = True
+    return int(total) if found else None
+
+
+class AdaptiveLimiter:
+    """Admission control whose limit follows tool latency, errors and model queue depth."""
+
+    def __init__(
+        self,
+        floor: int = DEFAULT_FLOOR,
+        ceiling: int = DEFAULT_CEILING,
+        initial: Optional[int] = None,
+        target_p95: float = DEFAULT_TARGET_P95,
+        max_error_rate: float = DEFAULT_MAX_ERROR_RATE,
+        max_queue_depth: int = DEFAULT_MAX_QUEUE_DEPTH,
+        queue_depth: Optional[Callable[[], Awaitable[Optional[int]]]] = None,
+        interval: float = ADJUST_INTERVAL,
+        on_change: Optional[Callable[[int, int, str], None]] = None,
+    ):
+        """
+        Args:
+            floor: Lowest limit the controller will set
+            ceiling: Highest limit the controller will set
+            initial: Starting limit (default: floor)
+            target_p95: Tool p95 latency in seconds above which the limit backs off
+            max_error_rate: Fraction of failed tool calls above which the limit backs off
+            max_queue_depth: Waiting model requests above which the limit backs off
+            queue_depth: Coroutine returning the model server's queue depth, e.g.
+                lambda: vllm_queue_depth(url); None ignores the signal
+            interval: Seconds between adjustments
+            on_change: Called with (old_limit, new_limit, reason) when the limit moves
+        """
+        if not 1 <= floor <= ceiling:
+            raise ValueError(f"Need 1 <= floor <= ceiling, got {floor} and {ceiling}")
+        self.floor = floor
+        self.ceiling = ceiling
+        self.limit = min(max(initial or floor, floor), ceiling)
+        self.target_p95 = target_p95
+        self.max_error_rate = max_error_rate
+        self.max_queue_depth = max_queue_depth
+        self.queue_depth = queue_depth
+        self.interval = interval
+        self.on_change = on_change
+
+        self.active = 0
+        self.peak = 0  # Most slots in use since the last adjustment
+        self.admitted = 0
+        self.samples: Deque[Tuple[float, float, bool]] = deque()  # (time, latency, error)
+        self.last_queue_depth: Optional[int] = None
+        self._condition: Optional[asyncio.Condition] = None
+        self._controller: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def record(self, latency: float, error: bool = False):
+        """Add one tool-call observation."""
+        self.samples.append((time.monotonic(), latency, error))
+
+    def _window(self) -> Tuple[Optional[float], float, int]:
+        cutoff = time.monotonic() - SAMPLE_WINDOW
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        count = len(self.samples)
+        if count < MIN_SAMPLES:
+            return None, 0.0, count
+        latencies = sorted(latency for _, latency, _ in self.samples)
+        p95 = latencies[min(count - 1, int(count * 0.95))]
+        error_rate = sum(error for _, _, error in self.samples) / count
+        return p95, error_rate, count
+
+    def _set_limit(self, limit: int, reason: str):
+        limit = min(max(limit, self.floor), self.ceiling)
+        if limit == self.limit:
+            return
+        old, self.limit = self.limit, limit
+        if self.on_change:
+            self.on_change(old, limit, reason)
+        if self._condition is not None and limit > old:
+            self._wake()
+
+    def _wake(self):
+        async def notify():
+            async with self._condition:
+                self._condition.notify_all()
+        asyncio.get_running_loop().create_task(notify())
+
+    async def adjust(self):
+        """Run one step of the controller."""
+        if self.queue_depth is not None:
+            self.last_queue_depth = await self.queue_depth()
+        p95, error_rate, _ = self._window()
+        queue = self.last_queue_depth
+
+        reason = None
+        if p95 is not None and p95 > self.target_p95:
+            reason = f"tool p95 {p95:.1f}s > {self.target_p95:.1f}s"
+        elif p95 is not None and error_rate > self.max_error_rate:
+            reason = f"error rate {error_rate:.0%} > {self.max_error_rate:.0%}"
+        elif queue is not None and queue > self.max_queue_depth:
+            reason = f"model queue {queue} > {self.max_queue_depth}"
+
+        if reason:
+            self._set_limit(int(self.limit * BACKOFF), reason)
+            # Samples from before the backoff describe the old load; judge the new one fresh
+            self.samples.clear()
+        elif self.peak >= self.limit:
+            self._set_limit(self.limit + STEP, "healthy and saturated")
+        self.peak = self.active
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.adjust()
+
+    def start(self):
+        """Start the controller on the running loop; called on first admission if not before."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # A new asyncio.run(): the old condition and controller belong to a closed loop
+            self._loop = loop
+            self._condition = asyncio.Condition()
+            self._controller = None
+        if self._controller is None or self._controller.done():
+            self._controller = loop.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the controller task."""
+        if self._controller is not None and self._loop is asyncio.get_running_loop():
+            self._controller.cancel()
+            try:
+                await self._controller
+            except asyncio.CancelledError:
+                pass
+        self._controller = None
+
+    async def acquire(self):
+        """Wait until fewer than limit episodes are running, then take a slot."""
+        self.start()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+            self.admitted += 1
+            self.peak = max(self.peak, self.active)
+
+    async def release(self):
+        """Give a slot back."""
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one episode slot for the duration of the block."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            await self.release()
+
+    def wrap(self, fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        """Wrap an async episode function so each call waits for a slot."""
+        async def wrapper(*args, **kwargs):
+            async with self.slot():
+                return await fn(*args, **kwargs)
+        return wrapper
+
+    def timed(self, fn: Callable[..., Any], is_error: Callable[[Any], bool] = lambda result: False) -> Callable[..., Any]:
+        """Wrap a tool-call function (sync or async) so each call is recorded; exceptions count as errors."""
+        if not inspect.iscoroutinefunction(fn):
+            def sync_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception:
+                    self.record(time.perf_counter() - start, error=True)
+                    raise
+                self.record(time.perf_counter() - start, error=is_error(result))
+                return result
+            return sync_wrapper
+
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception:
+                self.record(time.perf_counter() - start, error=True)
+                raise
+            self.record(time.perf_counter() - start, error=is_error(result))
+            return result
+        return wrapper
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Current limit, load and signal values."""
+        p95, error_rate, count = self._window()
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "admitted": self.admitted,
+            "tool_p95": p95,
+            "error_rate": error_rate,
+            "samples": count,
+            "queue_depth": self.last_queue_depth,
+        }
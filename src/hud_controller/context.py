@@ -1,21 +1,63 @@
 """Context that persists across hot-reloads for DeepResearch."""
 from hud.server.context import run_context_server
 import asyncio
-from typing import List, Dict
+import json
+import os
+import sys
+from typing import Any, List, Dict, Optional, Tuple
+
+from hud_controller.cache import SharedResponseCache
+
+# Memory for search/fetch responses shared through the context socket (0 disables it)
+SHARED_CACHE_MB = int(os.getenv("DEEPRESEARCH_SHARED_CACHE_MB", "256"))
+
+CONTEXT_SOCKET = "/tmp/hud_ctx.sock"  # Where server.py attaches
 
 class Context:
     def __init__(self):
         self.search_count = 0
         self.fetch_count = 0
         self.submitted_answer = None  # Store the agent's final answer
+        self.context_chars = 0  # Characters of tool output returned to the agent
+        self.budget = {}  # Episode token budget passed to setup
+        self.counters = {}  # Other named counters, e.g. from StatsBuffer.incr
+        self.deadline = None  # Wall-clock (time.time()) deadline for the episode
+        # Responses cached across episodes and server reloads; not cleared by reset_stats
+        self.response_cache = SharedResponseCache(SHARED_CACHE_MB * 1024 * 1024)
     
     def add_search(self, query: str, results: List[Dict[str, str]]):
         """Track a search operation."""
         self.search_count += 1
+        self.context_chars += len(str(results))
     
     def add_fetch(self, url: str, content_length: int):
         """Track a fetch operation."""
         self.fetch_count += 1
+        self.context_chars += content_length
+    
+    def set_budget(self, max_model_len: int, max_new_tokens: int, max_turns: int):
+        """Store the token budget for the current episode (0 means use the default)."""
+        self.budget = {
+            "max_model_len": max_model_len,
+            "max_new_tokens": max_new_tokens,
+            "max_turns": max_turns,
+        }
+    
+    def get_budget_state(self) -> Dict[str, int]:
+        """Get the episode budget together with how much of it has been used."""
+        return {
+            **self.budget,
+            "turns_used": self.search_count + self.fetch_count,
+            "context_chars": self.context_chars,
+        }
+    
+    def set_deadline(self, deadline: Optional[float]):
+        """Store the episode's wall-clock deadline (None for no time budget)."""
+        self.deadline = deadline
+    
+    def get_deadline(self) -> Optional[float]:
+        """Get the episode's wall-clock deadline."""
+        return self.deadline
     
     def get_search_count(self) -> int:
         """Get total number of searches performed."""
@@ -37,11 +79,61 @@ class Context:
         """Get the submitted answer."""
         return self.submitted_answer
     
+    def apply_updates(self, updates: Dict):
+        """Apply a batch of buffered updates from a StatsBuffer in one call."""
+        for key, value in updates.items():
+            if key == "searches":
+                self.search_count += value
+            elif key == "fetches":
+                self.fetch_count += value
+            elif key == "context_chars":
+                self.context_chars += value
+            elif key == "submitted_answer":
+                self.submitted_answer = value
+            elif key == "cache_puts":
+                self.cache_put_many(value)
+            else:
+                self.counters[key] = self.counters.get(key, 0) + value
+    
+    def get_stats(self) -> Dict:
+        """Get all episode statistics and the submitted answer in one call."""
+        return {
+            "search_count": self.search_count,
+            "fetch_count": self.fetch_count,
+            "total_operations": self.search_count + self.fetch_count,
+            "submitted_answer": self.submitted_answer,
+            **self.counters,
+        }
+    
+    def cache_get_many(self, keys: List[Any]) -> List[Optional[Any]]:
+        """Look up cached responses; None for each miss."""
+        if not self.response_cache.max_bytes:
+            return [None] * len(keys)
+        return self.response_cache.get_many(keys)
+    
+    def cache_put_many(self, entries: List[Tuple[Any, Any]]):
+        """Store (key, response) pairs in the shared response cache."""
+        if self.response_cache.max_bytes:
+            self.response_cache.put_many(entries)
+    
+    def cache_stats(self) -> Dict:
+        """Size and hit/miss/eviction counters of the shared response cache."""
+        return self.response_cache.stats()
+    
     def reset_stats(self):
         """Reset all statistics."""
         self.search_count = 0
         self.fetch_count = 0
         self.submitted_answer = None
+        self.context_chars = 0
+        self.budget = {}
+        self.counters = {}
+        self.deadline = None
 
 if __name__ == "__main__":
-    asyncio.run(run_context_server(Context()))
\ No newline at end of file
+    if sys.argv[1:] == ["--cache-stats"]:
+        # Query a running context server instead of starting one
+        from hud.server.context import attach_context
+        print(json.dumps(attach_context(CONTEXT_SOCKET).cache_stats(), indent=2))
+    else:
+        asyncio.run(run_context_server(Context()))
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""Exa search request shared by the MCP server and offline tools."""
+from typing import Dict, List
+
+import httpx
+
+from hud_controller.canonical import query_signature
+from hud_controller.jsonio import decode_results
+from hud_controller.tracing import httpx_hooks, span, traced
+
+EXA_SEARCH_URL = "https://api.exa.ai/search"
+
+
+def search_signature(query: str) -> str:
+    """Search cache key for a query; equivalent phrasings share it (see canonical.py)."""
+    return query_signature(query) or query
+
+
+@traced("exa.search", "backend")
+async def exa_search(query: str, max_results: int, exa_api_key: str) -> List[Dict[str, str]]:
+    """Run one Exa search; errors and empty results are returned as a single message dict."""
+    results = []
+
+    try:
+        async with httpx.AsyncClient(timeout=30.0, event_hooks=httpx_hooks()) as client:
+            response = await client.post(
+                EXA_SEARCH_URL,
+                headers={
+                    "x-api-key": exa_api_key,
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "query": query,
+                    "numResults": max_results,
+                    "type": "keyword",
+                    "userLocation": "us",  # Bias results for US region
+                    "contents": {
+                        "text": {"maxCharacters": 1000}  # Get text snippets
+                    }
+                }
+            )
+            
+            response.raise_for_status()
+            with span("json.decode", "parse"):
+                data = decode_results(response.content, ("title", "url"), ("autopromptString",))
+            
+            # Extract results
+            for result in data.get('results', []):
+                title = result.get('title', '')
+                url = result.get('url', '')
+                
+                if title and url:
+                    results.append({
+                        'title': title,
+                        'url': url
+                    })
+            
+            # If no results, provide helpful feedback
+            if not results:
+                return [{
+                    "message": "No results found",
+                    "query": query,
+                    "autopromptString": data.get('autopromptString', query)
+                }]
+                
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 401:
+            return [{
+                "error": "Invalid Exa API key",
+                "message": "Please check your EXA_API_KEY environment variable",
+                "status_code": str(e.response.status_code)
+            }]
+        elif e.response.status_code == 429:
+            return [{
+                "error": "Exa API rate limit exceeded",
+                "message": "Please wait before making more requests",
+                "status_code": str(e.response.status_code)
+            }]
+        else:
+            return [{
+                "error": f"Exa API error: {e.response.status_code}",
+                "message": str(e),
+                "response": e.response.text[:500]
+            }]
+    except Exception as e:
+        return [{
+            "error": f"Search failed: {type(e).__name__}",
+            "message": str(e)
+        }]
+
+    return results
+
+
+def is_search_hit(results: List[Dict[str, str]]) -> bool:
+    """Whether a search response holds real results rather than an error or 'no results' message."""
+    return bool(results) and "url" in results[0]
@@ -0,0 +1,446 @@
+"""Fetch pipeline: response cache -> Exa contents -> direct fetch, with per-host failure memory."""
+import asyncio
+import time
+from dataclasses import asdict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+from bs4 import BeautifulSoup
+
+from hud_controller.budget import FetchSize, missing_parts
+from hud_controller.cache import LRUCache, SingleFlight
+from hud_controller.canonical import RedirectMap, canonical_url, url_key
+from hud_controller.jsonio import DecodeError, decode_results
+from hud_controller.tracing import httpx_hooks, span, traced
+
+EXA_CONTENTS_URL = "https://api.exa.ai/contents"
+
+EXA_TIMEOUT = httpx.Timeout(30.0)
+DIRECT_TIMEOUT = httpx.Timeout(10.0, read=15.0)  # Fallback path, keep it short
+DIRECT_PER_HOST_LIMIT = 2  # Concurrent direct fetches per domain
+DIRECT_MAX_TEXT_CHARS = 12000  # Upper bound kept from a directly fetched page
+
+BREAKER_FAILURE_THRESHOLD = 3  # Consecutive failures before a host is cut off
+BREAKER_RESET_TIMEOUT = 60.0  # Seconds before a half-open probe is allowed
+NEGATIVE_CACHE_TTL = 900.0  # Seconds a hard failure is remembered
+RESPONSE_CACHE_SIZE = 512  # URLs kept in the in-process response cache
+
+# Status codes that will not change on retry: gone, or blocking automated access
+HARD_FAILURE_STATUSES = {401, 403, 404, 410, 451}
+# Of those, the ones Exa's crawler can report for the page itself; the rest only mean the
+# site blocks Exa, and the direct fetch (browser User-Agent) may still get through
+EXA_HARD_FAILURE_STATUSES = {404, 410}
+
+DIRECT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
+}
+
+
+class FetchError(Exception):
+    """
+    A fetch backend failed. Hard failures are not worth retrying for this URL; host
+    failures (connect errors, timeouts, 5xx) count against the host's circuit breaker.
+    """
+
+    def __init__(self, message: str, hard: bool = False, host: bool = False):
+        super().__init__(message)
+        self.hard = hard
+        self.host = host
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe."""
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.probing or time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a request may go through; in half-open state only one probe is let through."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+    def release(self):
+        """Give up a half-open probe without a verdict, e.g. when the caller was cancelled."""
+        self.probing = False
+
+
+def format_fetch_result(result: Dict, size: FetchSize) -> str:
+    """Format an Exa contents result into the summary / highlights / text layout."""
+    text = result.get('text', '')
+    summary = result.get('summary', '') if size.summary else ''
+    highlights = (result.get('highlights') or [])[:size.highlights]
+    
+    formatted_content = []
+    
+    # Add summary
+    if summary:
+        formatted_content.append("=== SUMMARY (Main Takeaways) ===")
+        formatted_content.append(summary)
+        formatted_content.append("")
+    
+    # Add highlights
+    if highlights:
+        formatted_content.append("=== KEY HIGHLIGHTS ===")
+        for i, highlight in enumerate(highlights, 1):
+            formatted_content.append(f"\nHighlight {i}:")
+            formatted_content.append(highlight)
+        formatted_content.append("")
+    
+    # Add main text (truncated if needed)
+    if text:
+        formatted_content.append("=== FULL CONTENT ===")
+        if len(text) > size.text_chars:
+            text = text[:size.text_chars] + "...[truncated]"
+        formatted_content.append(text)
+    
+    return "\n".join(formatted_content)
+
+
+def _nothing_missing(missing: FetchSize) -> bool:
+    return not missing.text_chars and not missing.summary and not missing.highlights
+
+
+class FetchPipeline:
+    """
+    Ordered fetch backend chain shared by every episode in this process.
+
+    Results are dicts with 'text' and optionally 'summary' and 'highlights', in the
+    shape Exa returns them. Everything is keyed by canonical URL (after learned
+    redirects), a cached result is reused when it covers the requested size, a
+    request for more detail than is cached only fetches the missing parts, and
+    concurrent fetches of the same key share one upstream request.
+    """
+
+    def __init__(self, exa_api_key: Optional[str] = None, cache_size: int = RESPONSE_CACHE_SIZE,
+                 shared=None):
+        """
+        Args:
+            exa_api_key: Exa key; without one only the direct backend is used
+            cache_size: URLs kept in the in-process response cache
+            shared: Second-level cache with async cache_get(key) and cache_put(key, value),
+                e.g. the server's StatsBuffer fronting the context's shared cache
+        """
+        self.exa_api_key = exa_api_key
+        self.cache = LRUCache(cache_size)
+        self.shared = shared
+        self.negative: Dict[str, Tuple[float, str]] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.host_limits: Dict[str, asyncio.Semaphore] = {}
+        self.redirects = RedirectMap()
+        self.inflight = SingleFlight()
+        self.stats = {
+            "cache_hits": 0,
+            "shared_hits": 0,
+            "coalesced": 0,
+            "negative_hits": 0,
+            "breaker_rejections": 0,
+            "exa_fetches": 0,
+            "direct_fetches": 0,
+        }
+
+    def _breaker(self, key: str) -> CircuitBreaker:
+        if key not in self.breakers:
+            self.breakers[key] = CircuitBreaker()
+        return self.breakers[key]
+
+    def _missing(self, key: str, size: FetchSize) -> Tuple[Optional[Tuple[Dict, FetchSize]], FetchSize]:
+        """The cache entry for key, if any, and the parts of size it does not cover."""
+        entry = self.cache.get(key)
+        if entry is None:
+            return None, size
+        result, cached_size = entry
+        text_complete = len(result.get("text") or "") < cached_size.text_chars
+        return entry, missing_parts(cached_size, text_complete, size)
+
+    @staticmethod
+    def _merge(entry: Optional[Tuple[Dict, FetchSize]], result: Dict,
+               size: FetchSize) -> Tuple[Dict, FetchSize]:
+        """Combine newly fetched parts with what was already cached for the URL."""
+        if entry is None:
+            return result, size
+        cached, cached_size = entry
+        merged = dict(cached)
+        for part in ("summary", "highlights"):
+            if result.get(part):
+                merged[part] = result[part]
+        if size.text_chars > cached_size.text_chars and "text" in result:
+            merged["text"] = result["text"]
+        return merged, FetchSize(
+            summary=cached_size.summary or size.summary,
+            highlights=max(cached_size.highlights, size.highlights),
+            text_chars=max(cached_size.text_chars, size.text_chars),
+        )
+
+    def _store(self, key: str, result: Dict, size: FetchSize, final_url: Optional[str] = None):
+        if final_url:
+            # Learn redirects so the next request for either URL hits the same entry
+            target = canonical_url(final_url)
+            self.redirects.learn(key, target)
+            self.cache.put(target, (result, size))
+        self.cache.put(key, (result, size))
+
+    def export_cache(self) -> List[Dict]:
+        """Cache entries in snapshot form (see cache.save_snapshot)."""
+        return [
+            {"key": key, "size": asdict(size), "result": result}
+            for key, (result, size) in self.cache.items()
+        ]
+
+    def import_cache(self, entries: List[Dict]):
+        """Load snapshot entries, e.g. written by prewarm_cache.py, growing the cache to fit."""
+        self.cache.max_entries = max(self.cache.max_entries, len(self.cache) + len(entries))
+        for entry in entries:
+            self.cache.put(entry["key"], (entry["result"], FetchSize(**entry["size"])))
+
+    def _negative(self, key: str) -> Optional[str]:
+        entry = self.negative.get(key)
+        if entry is None:
+            return None
+        expires, message = entry
+        if time.monotonic() >= expires:
+            del self.negative[key]
+            return None
+        return message
+
+    async def fetch(self, url: str, size: FetchSize) -> Tuple[Dict, str]:
+        """
+        Fetch a URL through the backend chain.
+
+        Args:
+            url: The URL to fetch
+            size: How much summary, highlights and text the caller needs
+
+        Returns:
+            (result, source): result dict with 'text' and optionally 'summary' and
+            'highlights'; source is 'cache', 'shared', 'coalesced', 'exa' or 'direct'
+
+        Raises:
+            FetchError: If every backend failed, the URL is known bad, or its host is cut off
+        """
+        key, _ = url_key(url, self.redirects)
+
+        # What is already cached stays servable even if a later request for the URL failed
+        entry, missing = self._missing(key, size)
+        if _nothing_missing(missing):
+            self.stats["cache_hits"] += 1
+            return entry[0], "cache"
+
+        message = self._negative(key)
+        if message is not None:
+            self.stats["negative_hits"] += 1
+            if entry is not None and not missing.text_chars:
+                return entry[0], "cache"
+            raise FetchError(f"{message} (cached failure)", hard=True)
+
+        (result, source), shared = await self.inflight.do(
+            (key, size), lambda: self._fetch_uncached(url, key, size)
+        )
+        if shared:
+            self.stats["coalesced"] += 1
+            return result, "coalesced"
+        return result, source
+
+    async def _fetch_uncached(self, url: str, key: str, size: FetchSize) -> Tuple[Dict, str]:
+        """
+        Check the shared cache, then run the upstream backends for the parts of a URL
+        that are still missing and merge them into whatever was already cached (e.g.
+        add highlights to cached text).
+        """
+        if self.shared is not None:
+            value = await self.shared.cache_get(("fetch", key))
+            if value is not None:
+                self.cache.put(key, self._merge(self.cache.get(key), value["result"], FetchSize(**value["size"])))
+        entry, missing = self._missing(key, size)
+        if _nothing_missing(missing):
+            self.stats["shared_hits"] += 1
+            return entry[0], "shared"
+        # Only Exa can add summary or highlights; if it fails, what is cached beats nothing
+        upgrade = entry is not None and not missing.text_chars
+
+        host = urlparse(key).netloc
+        host_breaker = self._breaker(host)
+        if not host_breaker.allow():
+            self.stats["breaker_rejections"] += 1
+            if entry is not None:
+                return entry[0], "cache"
+            raise FetchError(f"Host {host} is failing, skipping for now")
+
+        errors = []
+        host_fault = False
+        backends = [("exa", self._exa_fetch), ("direct", self._direct_fetch)]
+        for name, backend in backends:
+            if name == "exa" and (not self.exa_api_key or not self._breaker("exa").allow()):
+                continue
+            if name == "direct" and upgrade:
+                continue
+            try:
+                result, fetched_size, final_url = await backend(url, missing)
+            except FetchError as e:
+                if e.hard and upgrade:
+                    # The text was fetched before; serve it rather than marking the URL bad
+                    host_breaker.release()
+                    return entry[0], "cache"
+                if e.hard:
+                    # The host answered (e.g. 404); only this URL is bad
+                    self.negative[key] = (time.monotonic() + NEGATIVE_CACHE_TTL, str(e))
+                    host_breaker.record_success()
+                    raise
+                errors.append(f"{name}: {e}")
+                host_fault = host_fault or e.host
+                continue
+            except BaseException:
+                # Cancelled (the episode ran out of time) or an unexpected error such as
+                # httpx.InvalidURL: no verdict on the host or Exa, but free any half-open probe
+                host_breaker.release()
+                self._breaker("exa").release()
+                raise
+            host_breaker.record_success()
+            result, fetched_size = self._merge(self.cache.get(key), result, fetched_size)
+            self._store(key, result, fetched_size, final_url)
+            if self.shared is not None:
+                self.shared.cache_put(("fetch", key), {"result": result, "size": asdict(fetched_size)})
+            return result, name
+
+        if upgrade:
+            # The page itself was reachable before; serve the cached parts
+            host_breaker.release()
+            return entry[0], "cache"
+        if host_fault:
+            host_breaker.record_failure()
+        else:
+            host_breaker.release()
+        raise FetchError("; ".join(errors) or "No fetch backend available")
+
+    @traced("exa.contents", "backend")
+    async def _exa_fetch(self, url: str, size: FetchSize) -> Tuple[Dict, FetchSize, Optional[str]]:
+        """Fetch through the Exa contents API, asking only for the parts in size (text_chars 0: no text)."""
+        self.stats["exa_fetches"] += 1
+        request = {
+            "urls": [url],
+            "text": {
+                "maxCharacters": size.text_chars,
+                "includeHtmlTags": False
+            } if size.text_chars else False,
+            "livecrawl": "fallback"
+        }
+        if size.highlights:
+            request["highlights"] = {
+                "numSentences": 5,
+                "highlightsPerUrl": size.highlights
+            }
+        if size.summary:
+            request["summary"] = {
+                "query": "main takeaways"
+            }
+
+        exa_breaker = self._breaker("exa")
+        try:
+            async with httpx.AsyncClient(timeout=EXA_TIMEOUT, event_hooks=httpx_hooks()) as client:
+                response = await client.post(
+                    EXA_CONTENTS_URL,
+                    headers={
+                        "x-api-key": self.exa_api_key,
+                        "Content-Type": "application/json"
+                    },
+                    json=request
+                )
+                response.raise_for_status()
+                with span("json.decode", "parse"):
+                    data = decode_results(
+                        response.content, ("url", "text", "summary", "highlights"), ("statuses",)
+                    )
+        except httpx.HTTPStatusError as e:
+            # Exa itself is unhealthy (bad key, rate limit, 5xx); the page may still be fine
+            exa_breaker.record_failure()
+            raise FetchError(f"Exa API error: {e.response.status_code} - {e.response.text[:200]}")
+        except (httpx.RequestError, DecodeError) as e:
+            exa_breaker.record_failure()
+            raise FetchError(f"Exa request failed: {type(e).__name__} - {e}")
+        exa_breaker.record_success()
+
+        results = data.get('results', [])
+        if results:
+            return results[0], size, results[0].get('url')
+
+        # Exa reports per-URL crawl failures in 'statuses'
+        for status in data.get('statuses') or []:
+            error = status.get('error') or {}
+            code = error.get('httpStatusCode')
+            if code in HARD_FAILURE_STATUSES:
+                raise FetchError(f"HTTP error {code}: {error.get('tag', 'crawl failed')}",
+                                 hard=code in EXA_HARD_FAILURE_STATUSES)
+        raise FetchError("No content available for this URL")
+
+    @traced("direct.get", "backend")
+    async def _direct_fetch(self, url: str, size: FetchSize) -> Tuple[Dict, FetchSize, Optional[str]]:
+        """Fetch the page directly and extract its text, limited per domain."""
+        self.stats["direct_fetches"] += 1
+        host = urlparse(url).netloc.lower()
+        if host not in self.host_limits:
+            self.host_limits[host] = asyncio.Semaphore(DIRECT_PER_HOST_LIMIT)
+
+        async with self.host_limits[host]:
+            try:
+                async with httpx.AsyncClient(follow_redirects=True, timeout=DIRECT_TIMEOUT,
+                                             event_hooks=httpx_hooks()) as client:
+                    response = await client.get(url, headers=DIRECT_HEADERS)
+                    response.raise_for_status()
+            except httpx.HTTPStatusError as e:
+                code = e.response.status_code
+                raise FetchError(
+                    f"HTTP error {code}: {e.response.reason_phrase}",
+                    hard=code in HARD_FAILURE_STATUSES,
+                    host=code >= 500
+                )
+            except httpx.RequestError as e:
+                raise FetchError(
+                    f"Request error: {type(e).__name__} - {e}",
+                    host=isinstance(e, (httpx.TimeoutException, httpx.NetworkError))
+                )
+
+        # Parse HTML and extract text
+        with span("html.extract", "parse"):
+            soup = BeautifulSoup(response.text, 'lxml')
+            for script in soup(["script", "style"]):
+                script.decompose()
+            lines = (line.strip() for line in soup.get_text().splitlines())
+            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+            text = ' '.join(chunk for chunk in chunks if chunk)
+        if not text:
+            raise FetchError("No text content found")
+
+        # A direct fetch never has a summary or highlights
+        fetched_size = FetchSize(summary=False, highlights=0, text_chars=DIRECT_MAX_TEXT_CHARS)
+        return {"text": text[:DIRECT_MAX_TEXT_CHARS]}, fetched_size, str(response.url)
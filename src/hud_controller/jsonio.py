@@ -0,0 +1,87 @@
+"""
+JSON encode/decode with the fastest available backend.
+
+msgspec is used for Exa responses when installed, since it can decode only the
+fields we read and skip the rest; orjson is used for general loads/dumps; the
+stdlib json module is the fallback for both. Install with `pip install .[fast-json]`.
+"""
+import functools
+import json
+from typing import IO, Any, Dict, Optional, Sequence, Union
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Raised for malformed input by whichever backend is in use (orjson's error is a ValueError)
+DecodeError = (ValueError, msgspec.DecodeError) if msgspec is not None else ValueError
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Decode a JSON document."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any, compact: bool = True) -> str:
+    """Encode to a JSON string, compact or indented by 2 like json.dump(..., indent=2)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=0 if compact else orjson.OPT_INDENT_2).decode()
+    if compact:
+        return json.dumps(obj, separators=(",", ":"))
+    return json.dumps(obj, indent=2)
+
+
+def load(f: IO) -> Any:
+    """Decode a JSON document from an open file."""
+    return loads(f.read())
+
+
+def dump(obj: Any, f: IO, compact: bool = True):
+    """Encode to an open text file."""
+    f.write(dumps(obj, compact))
+
+
+@functools.lru_cache(maxsize=None)
+def _results_decoder(fields: Sequence[str], top_fields: Sequence[str]):
+    Result = msgspec.defstruct("Result", [(name, Any, None) for name in fields])
+    Response = msgspec.defstruct(
+        "Response",
+        [("results", Optional[list[Result]], None)] + [(name, Any, None) for name in top_fields],
+    )
+    return msgspec.json.Decoder(Response)
+
+
+def decode_results(content: Union[bytes, str], fields: Sequence[str],
+                   top_fields: Sequence[str] = ()) -> Dict[str, Any]:
+    """
+    Decode an Exa response, keeping only the given fields of each entry in 'results'.
+
+    Args:
+        content: Raw response body
+        fields: Keys to keep from each result, e.g. ("title", "url")
+        top_fields: Top-level keys to keep besides 'results', e.g. ("statuses",)
+
+    Returns:
+        Dict shaped like the Exa response; with msgspec only the requested keys are
+        present, without it the whole response is returned, so read keys with .get()
+    """
+    fields, top_fields = tuple(fields), tuple(top_fields)
+    if msgspec is not None:
+        response = _results_decoder(fields, top_fields).decode(content)
+        data = {name: getattr(response, name) for name in top_fields if getattr(response, name) is not None}
+        data["results"] = [
+            {name: getattr(result, name) for name in fields if getattr(result, name) is not None}
+            for result in response.results or []
+        ]
+        return data
+
+    # Projecting after a full stdlib decode only adds work, so return the document whole
+    return loads(content)
@@ -0,0 +1,9 @@
+"""Answer matching shared by the evaluate tool and the offline scripts."""
+from typing import Optional
+
+
+def answer_matches(submitted: Optional[str], expected: str) -> bool:
+    """Case-insensitive check that the expected answer is contained in the submitted text."""
+    if submitted is None:
+        return False
+    return expected.strip().lower() in submitted.strip().lower()
@@ -1,44 +1,125 @@
 """Simple DeepResearch MCP server for HUD."""
-import httpx
+import asyncio
 import os
+import time
 from pathlib import Path
-from bs4 import BeautifulSoup
-from urllib.parse import quote_plus, urlparse
+from urllib.parse import urlparse
 from hud.server import MCPServer
 from hud.server.context import attach_context
-from typing import List, Dict
+from typing import List, Dict, Optional
 from dotenv import load_dotenv
 
+from hud_controller.budget import DETAIL_FULL, DETAIL_LEVELS, fixed_size, size_fetch
+from hud_controller.cache import LRUCache, SingleFlight, load_snapshot
+from hud_controller.canonical import NearDuplicateIndex, query_tokens
+from hud_controller.exa_search import exa_search, is_search_hit, search_signature
+from hud_controller.fetch_pipeline import FetchError, FetchPipeline, format_fetch_result
+from hud_controller.scoring import answer_matches
+from hud_controller.stats import StatsBuffer
+from hud_controller.tracing import span, traced
+
 # Load .env file from the same directory as this script
 env_path = Path(__file__).parent / ".env"
 load_dotenv(env_path)
 
 mcp = MCPServer(name="deepresearch")
 ctx = None
+stats = None  # Buffered writes to ctx so tool handlers never block on IPC
+pipeline = None
+episode_deadline = None  # Wall-clock deadline for the current episode, mirrored from ctx
+
+# Search responses keyed by (query signature, max_results), shared across episodes
+SEARCH_CACHE_SIZE = 1024
+search_cache = LRUCache(SEARCH_CACHE_SIZE)
+search_inflight = SingleFlight()
+
+# Look up and store responses in the context process's shared cache, which survives
+# server reloads and is shared by every server attached to the same context
+SHARED_CACHE = os.getenv("DEEPRESEARCH_SHARED_CACHE", "1") == "1"
+
+# Cache snapshot written by prewarm_cache.py, loaded at startup when set
+CACHE_SNAPSHOT = os.getenv("DEEPRESEARCH_CACHE_SNAPSHOT")
+
+# Jaccard threshold for treating two queries' token sets as the same search (0 disables)
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("DEEPRESEARCH_QUERY_NEAR_DUP", "0"))
+near_duplicates = NearDuplicateIndex(NEAR_DUPLICATE_THRESHOLD) if NEAR_DUPLICATE_THRESHOLD > 0 else None
+
+# Exa keyword search returns at most 10 results per request
+MAX_SEARCH_RESULTS = 10
+
+# Size fetches from the episode's remaining token budget unless the caller says otherwise
+ADAPTIVE_FETCH_DEFAULT = os.getenv("DEEPRESEARCH_ADAPTIVE_FETCH", "0") == "1"
+
+# Fetch detail level when the caller doesn't pick one: text, highlights or full
+FETCH_DETAIL_DEFAULT = os.getenv("DEEPRESEARCH_FETCH_DETAIL", DETAIL_FULL)
 
 @mcp.initialize
 async def init(init_ctx):
-    global ctx
+    global ctx, stats, pipeline, episode_deadline
     ctx = attach_context("/tmp/hud_ctx.sock")
+    stats = StatsBuffer(ctx)
+    pipeline = FetchPipeline(os.getenv("EXA_API_KEY"), shared=stats if SHARED_CACHE else None)
+    if CACHE_SNAPSHOT:
+        snapshot = load_snapshot(CACHE_SNAPSHOT)
+        search_cache.max_entries = max(search_cache.max_entries, len(snapshot["search"]))
+        for entry in snapshot["search"]:
+            search_cache.put((entry["signature"], entry["max_results"]), entry["results"])
+        pipeline.import_cache(snapshot["fetch"])
+    # Pick up the running episode's deadline if the server was reloaded mid-episode
+    episode_deadline = await stats.call("get_deadline")
 
 @mcp.shutdown
 async def cleanup():
-    global ctx
+    global ctx, stats, pipeline
+    if stats is not None:
+        await stats.flush()
     ctx = None
+    stats = None
+    pipeline = None
+
+def _time_left() -> Optional[float]:
+    """Seconds until the episode deadline, or None if the episode has no time budget."""
+    if episode_deadline is None:
+        return None
+    return episode_deadline - time.time()
+
+def _cached_search(signature: str, max_results: int) -> Optional[List[Dict[str, str]]]:
+    """Results for a signature from the local cache; an entry for more results serves fewer."""
+    for cached_max in range(max_results, MAX_SEARCH_RESULTS + 1):
+        results = search_cache.get((signature, cached_max))
+        if results is not None:
+            return results[:max_results]
+    return None
+
+async def _search_upstream(query: str, cache_key: tuple, exa_api_key: str):
+    """Search through the shared cache, then Exa; returns (results, source)."""
+    shared_key = ("search", *cache_key)
+    if SHARED_CACHE:
+        # As locally, an entry for more results serves a request for fewer
+        signature, max_results = cache_key
+        keys = [("search", signature, cached_max) for cached_max in range(max_results, MAX_SEARCH_RESULTS + 1)]
+        for results in await stats.cache_get_many(keys):
+            if results is not None:
+                return results[:max_results], "shared"
+    results = await exa_search(query, cache_key[1], exa_api_key)
+    if SHARED_CACHE and is_search_hit(results):
+        stats.cache_put(shared_key, results)
+    return results, "exa"
 
 @mcp.tool()
-async def search(query: str) -> List[Dict[str, str]]:
+@traced("search")
+async def search(query: str, max_results: int = 1) -> List[Dict[str, str]]:
     """
     Search the web for information and return titles and URLs using Exa API.
     
     Args:
         query: The search query string
+        max_results: Maximum number of results to return (default: 1, capped at 10)
     
     Returns:
         List of dictionaries containing 'title' and 'url' for each result
     """
-    results = []
-    max_results = 1  # Hardcoded to 1 result
+    max_results = max(1, min(max_results, MAX_SEARCH_RESULTS))
     
     # Get Exa API key from environment
     exa_api_key = os.getenv("EXA_API_KEY")
@@ -49,189 +130,133 @@ async def search(query: str) -> List[Dict[str, str]]:
             "instructions": "Get your API key from https://dashboard.exa.ai/home"
         }]
     
-    try:
-        # Use Exa search API
-        search_url = "https://api.exa.ai/search"
-        
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                search_url,
-                headers={
-                    "x-api-key": exa_api_key,
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "query": query,
-                    "numResults": max_results,
-                    "type": "keyword",
-                    "userLocation": "us",  # Bias results for US region
-                    "contents": {
-                        "text": {"maxCharacters": 1000}  # Get text snippets
-                    }
-                }
-            )
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            # Extract results
-            for result in data.get('results', []):
-                title = result.get('title', '')
-                url = result.get('url', '')
-                
-                if title and url:
-                    results.append({
-                        'title': title,
-                        'url': url
-                    })
-            
-            # If no results, provide helpful feedback
-            if not results:
-                return [{
-                    "message": "No results found",
-                    "query": query,
-                    "autopromptString": data.get('autopromptString', query)
-                }]
-                
-    except httpx.HTTPStatusError as e:
-        if e.response.status_code == 401:
-            return [{
-                "error": "Invalid Exa API key",
-                "message": "Please check your EXA_API_KEY environment variable",
-                "status_code": str(e.response.status_code)
-            }]
-        elif e.response.status_code == 429:
-            return [{
-                "error": "Exa API rate limit exceeded",
-                "message": "Please wait before making more requests",
-                "status_code": str(e.response.status_code)
-            }]
-        else:
-            return [{
-                "error": f"Exa API error: {e.response.status_code}",
-                "message": str(e),
-                "response": e.response.text[:500]
-            }]
-    except Exception as e:
-        return [{
-            "error": f"Search failed: {type(e).__name__}",
-            "message": str(e)
-        }]
+    timeout_result = [{
+        "error": "Episode time budget exhausted",
+        "message": "Search was cancelled because the episode deadline passed. Submit your answer now.",
+        "timeout": True
+    }]
+    remaining = _time_left()
+    if remaining is not None and remaining <= 0:
+        stats.incr("deadline_misses")
+        return timeout_result
+    
+    # Queries that differ only in case, punctuation, word order or the answer-format
+    # suffix share one cache entry and one in-flight request
+    tokens = query_tokens(query)
+    signature = search_signature(query)
+    if _cached_search(signature, max_results) is None and near_duplicates is not None:
+        match = near_duplicates.find(tokens)
+        if match is not None and match != signature:
+            stats.incr("search_near_duplicates")
+            signature = match
+    cache_key = (signature, max_results)
+    
+    results = _cached_search(signature, max_results)
+    if results is not None:
+        stats.incr("search_cache_hits")
+    else:
+        try:
+            # Cancel the upstream request if it would outlive the episode
+            async with asyncio.timeout(remaining):
+                (results, source), shared = await search_inflight.do(
+                    cache_key, lambda: _search_upstream(query, cache_key, exa_api_key)
+                )
+        except TimeoutError:
+            stats.incr("deadline_misses")
+            return timeout_result
+        if shared:
+            stats.incr("search_coalesced")
+        elif is_search_hit(results):
+            if source == "shared":
+                stats.incr("search_shared_hits")
+            search_cache.put(cache_key, results)
+            if near_duplicates is not None:
+                near_duplicates.add(signature, tokens)
+    
+    if not is_search_hit(results):
+        return results
     
     # Store search history in context
-    ctx.add_search(query, results)
+    stats.add_search(query, results)
     
     return results
 
 @mcp.tool()
-async def fetch(url: str) -> str:
+@traced("fetch")
+async def fetch(url: str, max_length: int = 2500, adaptive: bool = ADAPTIVE_FETCH_DEFAULT,
+                detail: str = "") -> str:
     """
     Fetch and extract content from a URL using Exa API, including summary, highlights, and full text.
+    Falls back to fetching the page directly when Exa fails, and fails fast for URLs
+    and hosts that recently failed.
     
     Args:
         url: The URL to fetch content from
+        max_length: Maximum characters of page text to return (default: 2500)
+        adaptive: Size summary, highlights and text from the episode's remaining
+            token budget instead of max_length
+        detail: 'text' (page text only, fastest), 'highlights' (text + 3 highlights)
+            or 'full' (text, highlights and a summary); defaults to the server policy.
+            Ignored when adaptive is set
     
     Returns:
-        Formatted content including:
+        Formatted content including, depending on detail:
         - Summary with main takeaways
-        - 3 key highlights (5 sentences each)
-        - Full text content (truncated to 2500 characters)
+        - Up to 3 key highlights (5 sentences each)
+        - Full text content (truncated to max_length characters)
     """
-    max_length = 2500  # Hardcoded to 2500 characters
     # Validate URL
     parsed = urlparse(url)
     if not parsed.scheme or not parsed.netloc:
         return f"Invalid URL: {url}"
     
-    # Get Exa API key
-    exa_api_key = os.getenv("EXA_API_KEY")
-    if not exa_api_key:
-        # Return failure message if no API key
-        return "Fetch failed: No Exa API key available"
+    timeout_message = "Fetch failed: episode time budget exhausted. Submit your answer now."
+    remaining = _time_left()
+    if remaining is not None and remaining <= 0:
+        stats.incr("deadline_misses")
+        return timeout_message
+    
+    detail = detail or FETCH_DETAIL_DEFAULT
+    if detail not in DETAIL_LEVELS:
+        return f"Invalid detail level: {detail}. Use one of: {', '.join(DETAIL_LEVELS)}"
+    size = size_fetch(await stats.call("get_budget_state")) if adaptive else fixed_size(max_length, detail)
     
+    start = time.perf_counter()
     try:
-        # Use Exa contents API for reliable fetching
-        contents_url = "https://api.exa.ai/contents"
-        
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                contents_url,
-                headers={
-                    "x-api-key": exa_api_key,
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "urls": [url],
-                    "text": {
-                        "maxCharacters": max_length,
-                        "includeHtmlTags": False
-                    },
-                    "highlights": {
-                        "numSentences": 5,
-                        "highlightsPerUrl": 3
-                    },
-                    "summary": {
-                        "query": "main takeaways"
-                    },
-                    "livecrawl": "fallback" 
-                }
-            )
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            # Extract text content, summary, and highlights
-            results = data.get('results', [])
-            if results and len(results) > 0:
-                result = results[0]
-                text = result.get('text', '')
-                summary = result.get('summary', '')
-                highlights = result.get('highlights', [])
-                
-                # Build formatted response
-                formatted_content = []
-                
-                # Add summary
-                if summary:
-                    formatted_content.append("=== SUMMARY (Main Takeaways) ===")
-                    formatted_content.append(summary)
-                    formatted_content.append("")
-                
-                # Add highlights
-                if highlights:
-                    formatted_content.append("=== KEY HIGHLIGHTS ===")
-                    for i, highlight in enumerate(highlights[:3], 1):
-                        formatted_content.append(f"\nHighlight {i}:")
-                        formatted_content.append(highlight)
-                    formatted_content.append("")
-                
-                # Add main text (truncated if needed)
-                if text:
-                    formatted_content.append("=== FULL CONTENT ===")
-                    if len(text) > max_length:
-                        text = text[:max_length] + "...[truncated]"
-                    formatted_content.append(text)
-                
-                final_content = "\n".join(formatted_content)
-                
-                # Store fetch history in context
-                ctx.add_fetch(url, len(final_content))
-                
-                return final_content if final_content else "No content available"
-            else:
-                return "No content available for this URL"
-                
-    except httpx.HTTPStatusError as e:
-        if e.response.status_code == 401:
-            # Invalid API key, return failure message
-            return "Fetch failed: Invalid Exa API key"
-        elif e.response.status_code == 429:
-            return "Exa API rate limit exceeded. Please wait before fetching more content."
-        else:
-            return f"Exa API error: {e.response.status_code} - {e.response.text[:200]}"
+        # Cache -> Exa contents -> direct fetch, skipping hosts and URLs known to be failing,
+        # cancelled if it would outlive the episode
+        async with asyncio.timeout(_time_left()):
+            result, source = await pipeline.fetch(url, size)
+    except TimeoutError:
+        stats.incr("deadline_misses")
+        return timeout_message
+    except FetchError as e:
+        return f"Fetch failed: {e}"
     except Exception as e:
         # Return failure message on any error
         return f"Fetch failed: {type(e).__name__} - {str(e)}"
+    
+    # Count how often equivalent URLs shared an upstream response
+    if source == "cache":
+        stats.incr("fetch_cache_hits")
+    elif source == "shared":
+        stats.incr("fetch_shared_hits")
+    elif source == "coalesced":
+        stats.incr("fetch_coalesced")
+    
+    # Upstream latency per detail level; mean = fetch_ms_<tier> / fetch_count_<tier>.
+    # Cache hits and coalesced waits would pull the means toward zero, so they are left out
+    if source in ("exa", "direct"):
+        stats.incr(f"fetch_ms_{size.detail}", round((time.perf_counter() - start) * 1000))
+        stats.incr(f"fetch_count_{size.detail}")
+    
+    with span("format", "parse"):
+        final_content = format_fetch_result(result, size)
+    
+    # Store fetch history in context
+    stats.add_fetch(url, len(final_content))
+    
+    return final_content if final_content else "No content available"
 
 @mcp.tool()
 async def answer(final_answer: str) -> str:
@@ -244,14 +269,32 @@ async def answer(final_answer: str) -> str:
     Returns:
         Confirmation message
     """
-    ctx.submit_answer(final_answer)
+    stats.submit_answer(final_answer)
+    # The answer decides the reward, so confirm only once the context has it
+    try:
+        await stats.flush()
+    except Exception as e:
+        return f"Answer could not be recorded ({type(e).__name__}: {e}). Please call answer again."
     return f"Answer submitted: {final_answer}"
 
 @mcp.tool()
-async def setup() -> str:
-    """Required for HUD environments. Initialize for a new task."""
+async def setup(max_model_len: int = 0, max_new_tokens: int = 0, max_turns: int = 0,
+                time_budget_sec: float = 0) -> str:
+    """
+    Required for HUD environments. Initialize for a new task.
+    
+    Args:
+        max_model_len: Model context length in tokens, used by adaptive fetch (0 = default)
+        max_new_tokens: Per-turn generation limit in tokens (0 = default)
+        max_turns: Maximum agent turns in the episode (0 = default)
+        time_budget_sec: Wall-clock budget for the episode's tool calls (0 = unlimited)
+    """
+    global episode_deadline
     # Reset for a fresh task
-    ctx.reset_stats()
+    await stats.reset()
+    await stats.call("set_budget", max_model_len, max_new_tokens, max_turns)
+    episode_deadline = time.time() + time_budget_sec if time_budget_sec > 0 else None
+    await stats.call("set_deadline", episode_deadline)
     return ""
 
 @mcp.tool()
@@ -265,30 +308,30 @@ async def evaluate(expected_answer: str) -> dict:
     Returns:
         Evaluation result with reward and content string
     """
-    submitted = ctx.get_submitted_answer()
+    # Flushes any buffered updates, so the answer and counts are complete
+    episode = await stats.get_stats()
+    submitted = episode.pop("submitted_answer")
     
     # Check if an answer was submitted
     if submitted is None:
         return {
             "reward": 0.0,
-            "content": f"No answer submitted. Searches: {ctx.get_search_count()}, Fetches: {ctx.get_fetch_count()}"
+            "content": f"No answer submitted. Searches: {episode['search_count']}, Fetches: {episode['fetch_count']}",
+            "info": episode
         }
     
-    # Check if expected answer is contained in submitted answer (case-insensitive)
-    submitted_clean = submitted.strip().lower()
-    expected_clean = expected_answer.strip().lower()
-    
-    # Accept if expected answer is contained within submitted answer
-    is_correct = expected_clean in submitted_clean
+    # Accept if expected answer is contained within submitted answer (case-insensitive)
+    is_correct = answer_matches(submitted, expected_answer)
     
     # Build result message
     result_msg = f"{'✅ Correct!' if is_correct else '❌ Incorrect.'} "
     result_msg += f"Submitted: '{submitted}', Expected: '{expected_answer}'. "
-    result_msg += f"Stats: {ctx.get_search_count()} searches, {ctx.get_fetch_count()} fetches, {ctx.get_total_operations()} total operations."
+    result_msg += f"Stats: {episode['search_count']} searches, {episode['fetch_count']} fetches, {episode['total_operations']} total operations."
     
     return {
         "reward": 1.0 if is_correct else 0.0,
-        "content": result_msg
+        "content": result_msg,
+        "info": episode  # Counters, including cache hits and coalesced calls
     }
 
 if __name__ == "__main__":
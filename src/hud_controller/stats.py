@@ -0,0 +1,132 @@
+"""Buffered, non-blocking stat updates to the context server."""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+FLUSH_INTERVAL = 0.05  # Seconds updates may sit in the buffer before a flush
+MAX_PENDING = 64  # Buffered updates that trigger an immediate flush
+
+logger = logging.getLogger(__name__)
+
+
+class StatsBuffer:
+    """
+    Wraps the context proxy so tool handlers never make a synchronous IPC call.
+
+    Writes (add_search, add_fetch, submit_answer, ...) only touch local state and are
+    flushed in one batched apply_updates() call from a worker thread. Reads flush first,
+    so they always observe every update made before them.
+    """
+
+    def __init__(self, ctx, flush_interval: float = FLUSH_INTERVAL, max_pending: int = MAX_PENDING):
+        self.ctx = ctx
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[str, Any] = {}
+        self._pending_count = 0
+        self._cache_puts: List[Tuple[Any, Any]] = []  # Shared-cache writes, kept across reset()
+        self._lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None  # Flush after flush_interval
+        self._flush_now: Optional[asyncio.Task] = None  # Flush because max_pending was reached
+
+    def _add(self, key: str, amount: int = 1):
+        self._pending[key] = self._pending.get(key, 0) + amount
+        self._pending_count += 1
+        self._schedule()
+
+    def _schedule(self):
+        # At most one pending task of each kind, each kept referenced until it is done
+        loop = asyncio.get_running_loop()
+        if self._pending_count >= self.max_pending:
+            if self._flush_now is None or self._flush_now.done():
+                self._flush_now = loop.create_task(self._flush_later(0.0))
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush_later(self.flush_interval))
+
+    async def _flush_later(self, delay: float):
+        await asyncio.sleep(delay)
+        try:
+            await self.flush()
+        except Exception as e:
+            # The batch is back in the buffer; the next flush (every read flushes) retries it
+            logger.warning("Stats flush failed, will retry: %s: %s", type(e).__name__, e)
+
+    def _restore(self, updates: Dict[str, Any]):
+        """Put a batch that failed to send back in front of anything buffered since."""
+        updates = dict(updates)
+        self._cache_puts = updates.pop("cache_puts", []) + self._cache_puts
+        answer_pending = "submitted_answer" in self._pending
+        for key, value in updates.items():
+            if key == "submitted_answer":
+                if not answer_pending:
+                    self._pending[key] = value
+            else:
+                self._pending[key] = self._pending.get(key, 0) + value
+        self._pending_count += len(updates) + len(self._cache_puts)
+
+    def add_search(self, query: str, results: List[Dict[str, str]]):
+        """Track a search operation."""
+        self._add("searches")
+        self._add("context_chars", len(str(results)))
+
+    def add_fetch(self, url: str, content_length: int):
+        """Track a fetch operation."""
+        self._add("fetches")
+        self._add("context_chars", content_length)
+
+    def incr(self, key: str, amount: int = 1):
+        """Increment a named counter in the context."""
+        self._add(key, amount)
+
+    def submit_answer(self, answer: str):
+        """Store the agent's final answer."""
+        self._pending["submitted_answer"] = answer
+        self._pending_count += 1
+        self._schedule()
+
+    def cache_put(self, key: Any, value: Any):
+        """Queue a response for the context's shared cache; sent with the next flush."""
+        self._cache_puts.append((key, value))
+        self._pending_count += 1
+        self._schedule()
+
+    async def cache_get(self, key: Any) -> Optional[Any]:
+        """Look up one response in the context's shared cache (no flush needed)."""
+        return (await self.cache_get_many([key]))[0]
+
+    async def cache_get_many(self, keys: List[Any]) -> List[Optional[Any]]:
+        """Look up several responses in the context's shared cache in one call; None for each miss."""
+        return await asyncio.to_thread(self.ctx.cache_get_many, keys)
+
+    async def flush(self):
+        """Send all buffered updates to the context in a single call."""
+        async with self._lock:
+            if not self._pending and not self._cache_puts:
+                return
+            updates, self._pending, self._pending_count = self._pending, {}, 0
+            if self._cache_puts:
+                updates["cache_puts"], self._cache_puts = self._cache_puts, []
+            try:
+                await asyncio.to_thread(self.ctx.apply_updates, updates)
+            except Exception:
+                self._restore(updates)
+                raise
+
+    async def call(self, method: str, *args):
+        """Flush, then call a context method off the event loop and return its result."""
+        await self.flush()
+        return await asyncio.to_thread(getattr(self.ctx, method), *args)
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get all episode stats, including the submitted answer."""
+        return await self.call("get_stats")
+
+    async def get_submitted_answer(self) -> Optional[str]:
+        """Get the submitted answer."""
+        return await self.call("get_submitted_answer")
+
+    async def reset(self):
+        """Drop buffered stat updates and reset the context for a new episode."""
+        async with self._lock:
+            self._pending, self._pending_count = {}, len(self._cache_puts)
+        await asyncio.to_thread(self.ctx.reset_stats)
@@ -0,0 +1,161 @@
+"""
+Span tracing for tool calls, written in Chrome trace-event format.
+
+Set DEEPRESEARCH_TRACE to a file path (or to 1 for /tmp/deepresearch_trace.json) and
+open the file in https://ui.perfetto.dev or chrome://tracing. Each asyncio task gets
+its own track, so concurrent tool calls don't interleave. HTTP requests made with
+httpx_hooks() are broken down into connect (DNS + TCP), TLS, request send, waiting
+for response headers and body download, via httpcore's trace extension.
+
+When the variable is unset, traced() returns the function unchanged and span()
+returns a shared no-op context manager.
+"""
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DEFAULT_TRACE_PATH = "/tmp/deepresearch_trace.json"
+
+_NULL_SPAN = nullcontext()
+
+
+class Tracer:
+    """Appends complete ('X') events to a trace file as spans finish."""
+
+    def __init__(self, path: Optional[str]):
+        self.enabled = bool(path)
+        self._file = None
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._tids: Dict[int, int] = {}
+        self._next_tid = 0
+        self._open: Dict[Tuple[int, str], float] = {}
+        if self.enabled:
+            # The trace-event format accepts an array with no closing bracket, so
+            # the file stays valid even if the process is killed mid-run
+            self._file = open(path, "a", encoding="utf-8")
+            if self._file.tell() == 0:
+                self._file.write("[\n")
+                self._file.flush()
+
+    def _tid(self) -> int:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = id(task) if task is not None else threading.get_ident()
+        if key not in self._tids:
+            self._next_tid += 1
+            self._tids[key] = self._next_tid
+            if task is not None:
+                # Forget the task when it finishes, so a reused id gets a new track
+                task.add_done_callback(lambda _, key=key: self._forget(key))
+        return self._tids[key]
+
+    def _forget(self, key: int):
+        tid = self._tids.pop(key, None)
+        # Phases the task left open, e.g. when it was cancelled mid-request
+        for open_key in [open_key for open_key in self._open if open_key[0] == tid]:
+            del self._open[open_key]
+
+    def record(self, name: str, start: float, end: float, cat: str, args: Dict[str, Any]):
+        """Write one complete event; start and end are time.perf_counter() values."""
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": start * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": self._pid,
+            "tid": self._tid(),
+            "args": args,
+        }
+        line = json.dumps(event, default=str) + ",\n"
+        with self._lock:
+            self._file.write(line)
+            # Flushed per event so a killed process still leaves every finished span on disk
+            self._file.flush()
+
+    @contextmanager
+    def _span(self, name: str, cat: str, args: Dict[str, Any]):
+        start = time.perf_counter()
+        try:
+            yield args
+        except BaseException as e:
+            args["error"] = type(e).__name__
+            raise
+        finally:
+            self.record(name, start, time.perf_counter(), cat, args)
+
+    def span(self, name: str, cat: str = "tool", **args):
+        """Context manager timing a block; yields a dict that can take extra args."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name, cat, args)
+
+    async def _httpcore_trace(self, event_name: str, info: Dict[str, Any]):
+        # httpcore reports "<phase>.started" then "<phase>.complete" or "<phase>.failed"
+        phase, _, status = event_name.rpartition(".")
+        key = (self._tid(), phase)
+        if status == "started":
+            self._open[key] = time.perf_counter()
+        elif key in self._open:
+            start = self._open.pop(key)
+            args = {"status": status} if status != "complete" else {}
+            self.record(phase, start, time.perf_counter(), "http", args)
+
+    async def _on_request(self, request):
+        request.extensions["trace"] = self._httpcore_trace
+        # Kept on the request rather than in _open, so a request that never gets a
+        # response (connect error, timeout, cancellation) leaves nothing behind
+        request.extensions["trace_start"] = time.perf_counter()
+
+    async def _on_response(self, response):
+        # Response hooks run once headers arrive, before the body is read
+        request = response.request
+        start = request.extensions.pop("trace_start", None)
+        if start is not None:
+            self.record(
+                f"{request.method} {request.url.host}",
+                start,
+                time.perf_counter(),
+                "http",
+                {"status_code": response.status_code, "url": str(request.url)},
+            )
+
+    def httpx_hooks(self) -> Dict[str, list]:
+        """event_hooks for httpx.AsyncClient; empty when tracing is off."""
+        if not self.enabled:
+            return {}
+        return {"request": [self._on_request], "response": [self._on_response]}
+
+
+def _trace_path() -> Optional[str]:
+    value = os.getenv("DEEPRESEARCH_TRACE", "")
+    if value in ("", "0"):
+        return None
+    return DEFAULT_TRACE_PATH if value == "1" else value
+
+
+tracer = Tracer(_trace_path())
+span = tracer.span
+httpx_hooks = tracer.httpx_hooks
+
+
+def traced(name: str, cat: str = "tool") -> Callable:
+    """Decorator wrapping an async function in a span; a no-op when tracing is off."""
+    def decorator(fn: Callable) -> Callable:
+        if not tracer.enabled:
+            return fn
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with tracer.span(name, cat):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,184 @@
+"""
+Streaming, sharded loader for task files (a single JSON array of task dicts).
+
+The array is parsed incrementally, so memory stays flat whatever the file size.
+Tasks are assigned to shards by position (task i goes to rank i % world_size), and
+shuffling uses a seeded fixed-size buffer instead of materializing the list.
+
+Write this worker's shard for a taskset-driven job:
+    python task_loader.py deep_research_taskset_full_filtered.json --out /tmp/tasks_rank0.json
+
+Rank and world size default to the RANK / WORLD_SIZE variables set by torchrun and
+accelerate launch.
+"""
+import argparse
+import json
+import os
+import random
+from typing import Any, Dict, Iterator, Optional
+
+CHUNK_SIZE = 1 << 16  # Characters read per chunk
+SHUFFLE_BUFFER = 1024  # Tasks held at once when shuffling
+
+# Appended to SimpleQA prompts by simpleqa_upload.py
+ANSWER_INSTRUCTION = "Return just the answer, no other text."
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+def iter_tasks(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the elements of a top-level JSON array one at a time.
+
+    Args:
+        path: Path to a JSON file containing a single array
+        chunk_size: Characters read from the file at a time
+
+    Raises:
+        ValueError: If the file is not a JSON array
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        pos = 0
+        eof = False
+
+        def fill() -> bool:
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            # Drop what has been consumed so the buffer only ever holds one partial element
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            eof = not chunk
+            return bool(chunk)
+
+        def skip_whitespace():
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                    pos += 1
+                if pos < len(buffer) or not fill():
+                    return
+
+        skip_whitespace()
+        if pos >= len(buffer) or buffer[pos] != "[":
+            raise ValueError(f"{path} is not a JSON array")
+        pos += 1
+
+        while True:
+            skip_whitespace()
+            if pos >= len(buffer):
+                raise ValueError(f"Unexpected end of file in {path}")
+            if buffer[pos] == "]":
+                return
+            if buffer[pos] == ",":
+                pos += 1
+                skip_whitespace()
+
+            while True:
+                try:
+                    value, end = _decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof or not fill():
+                        raise
+                    continue
+                # A scalar cut off by the chunk boundary (e.g. "4." of "4.5") decodes as a
+                # shorter value; only accept it once the next token is a separator
+                after = end
+                while after < len(buffer) and buffer[after] in _WHITESPACE:
+                    after += 1
+                if (after >= len(buffer) or buffer[after] not in ",]") and not eof and fill():
+                    continue
+                break
+            pos = end
+            yield value
+
+
+def task_question(task: Dict[str, Any]) -> str:
+    """The task's question without the answer-format instruction, as the agent would search it."""
+    return task["prompt"].replace(ANSWER_INSTRUCTION, "").strip()
+
+
+def task_expected_answer(task: Dict[str, Any]) -> str:
+    """The expected answer passed to the evaluate tool."""
+    return task["evaluate_tool"]["arguments"]["expected_answer"]
+
+
+def iter_shard(path: str, rank: int = 0, world_size: int = 1) -> Iterator[Dict[str, Any]]:
+    """Yield only the tasks assigned to rank: every world_size-th task starting at rank."""
+    if not 0 <= rank < world_size:
+        raise ValueError(f"rank {rank} is outside world size {world_size}")
+    for index, task in enumerate(iter_tasks(path)):
+        if index % world_size == rank:
+            yield task
+
+
+def shuffled(tasks: Iterator[Dict[str, Any]], seed: int,
+             buffer_size: int = SHUFFLE_BUFFER) -> Iterator[Dict[str, Any]]:
+    """
+    Seeded buffer shuffle: deterministic for a given seed and input order, holding at
+    most buffer_size tasks. Tasks move at most buffer_size positions earlier.
+    """
+    rng = random.Random(seed)
+    buffer = []
+    for task in tasks:
+        if len(buffer) < buffer_size:
+            buffer.append(task)
+            continue
+        index = rng.randrange(buffer_size)
+        yield buffer[index]
+        buffer[index] = task
+    rng.shuffle(buffer)
+    yield from buffer
+
+
+def load_shard(path: str, rank: Optional[int] = None, world_size: Optional[int] = None,
+               seed: Optional[int] = None, epoch: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    This worker's tasks, optionally shuffled.
+
+    Args:
+        path: Task file (JSON array)
+        rank: Worker rank (default: RANK env var, or 0)
+        world_size: Number of workers (default: WORLD_SIZE env var, or 1)
+        seed: Shuffle seed; None keeps file order
+        epoch: Mixed into the seed so each epoch gets a different order
+    """
+    rank = int(os.getenv("RANK", "0")) if rank is None else rank
+    world_size = int(os.getenv("WORLD_SIZE", "1")) if world_size is None else world_size
+    tasks = iter_shard(path, rank, world_size)
+    if seed is not None:
+        tasks = shuffled(tasks, seed * 1_000_003 + epoch)
+    return tasks
+
+
+def write_tasks(tasks: Iterator[Dict[str, Any]], out_path: str) -> int:
+    """Stream tasks to a JSON array file and return how many were written."""
+    count = 0
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for task in tasks:
+            if count:
+                f.write(",\n")
+            f.write(json.dumps(task, ensure_ascii=False))
+            count += 1
+        f.write("\n]\n")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write this worker's shard of a task file")
+    parser.add_argument("tasks", help="Task file (JSON array)")
+    parser.add_argument("--out", required=True, help="Where to write the shard")
+    parser.add_argument("--rank", type=int, default=None)
+    parser.add_argument("--world-size", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None, help="Shuffle with this seed")
+    parser.add_argument("--epoch", type=int, default=0)
+    args = parser.parse_args()
+
+    count = write_tasks(load_shard(args.tasks, args.rank, args.world_size, args.seed, args.epoch), args.out)
+    print(f"Wrote {count} tasks to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
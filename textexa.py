@@ -6,6 +6,9 @@ from bs4 import BeautifulSoup
 from urllib.parse import urlparse
 import asyncio
 
+from hud_controller.jsonio import decode_results
+from hud_controller.tracing import httpx_hooks, span, traced
+
 
 class ExaClient:
     """Client for interacting with Exa search and content APIs."""
@@ -16,6 +19,7 @@ class ExaClient:
         self.search_url = "https://api.exa.ai/search"
         self.contents_url = "https://api.exa.ai/contents"
     
+    @traced("textexa.search")
     async def search(self, query: str, max_results: int = 5) -> List[Dict[str, str]]:
         """
         Search the web for information and return titles and URLs using Exa API.
@@ -39,7 +43,7 @@ class ExaClient:
         try:
             # Increase timeout for complex queries
             timeout = httpx.Timeout(30.0, read=60.0)  # 30s default, 60s for reading
-            async with httpx.AsyncClient(timeout=timeout) as client:
+            async with httpx.AsyncClient(timeout=timeout, event_hooks=httpx_hooks()) as client:
                 response = await client.post(
                     self.search_url,
                     headers={
@@ -58,7 +62,8 @@ class ExaClient:
                 )
                 
                 response.raise_for_status()
-                data = response.json()
+                with span("json.decode", "parse"):
+                    data = decode_results(response.content, ("title", "url"), ("autopromptString",))
                 
                 # Extract results
                 for result in data.get('results', []):
@@ -106,6 +111,7 @@ class ExaClient:
         
         return results
     
+    @traced("textexa.fetch")
     async def fetch(self, url: str, max_length: int = 2500) -> str:
         """
         Fetch and extract text content from a URL using Exa API.
@@ -129,7 +135,7 @@ class ExaClient:
         try:
             # Increase timeout for content fetching
             timeout = httpx.Timeout(30.0, read=60.0)  # 30s default, 60s for reading
-            async with httpx.AsyncClient(timeout=timeout) as client:
+            async with httpx.AsyncClient(timeout=timeout, event_hooks=httpx_hooks()) as client:
                 response = await client.post(
                     self.contents_url,
                     headers={
@@ -144,7 +150,8 @@ class ExaClient:
                 )
                 
                 response.raise_for_status()
-                data = response.json()
+                with span("json.decode", "parse"):
+                    data = decode_results(response.content, ("text",))
                 
                 # Extract text content
                 results = data.get('results', [])
@@ -171,6 +178,7 @@ class ExaClient:
             # Fallback to direct fetch on any error
             return await self._direct_fetch(url, max_length)
     
+    @traced("textexa.direct_fetch", "backend")
     async def _direct_fetch(self, url: str, max_length: int) -> str:
         """
         Direct fetch fallback when Exa API is not available.
@@ -179,7 +187,7 @@ class ExaClient:
         try:
             # Longer timeout for direct fetching as some sites are slow
             timeout = httpx.Timeout(30.0, read=45.0)
-            async with httpx.AsyncClient(follow_redirects=True, timeout=timeout) as client:
+            async with httpx.AsyncClient(follow_redirects=True, timeout=timeout, event_hooks=httpx_hooks()) as client:
                 response = await client.get(
                     url,
                     headers={
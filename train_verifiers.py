@@ -40,15 +40,38 @@ uv run vllm serve Qwen/Qwen2.5-7B-Instruct \
 
 torchrun --nproc-per-node 1 -m hud.rl.train --tasks deep_research_taskset_full_filtered_single.json --config deepresearch_rl_config.json --verbose
 
+Episode concurrency adapts between CONCURRENCY_FLOOR and CONCURRENCY_CEILING from tool
+latency, tool errors and the vLLM queue depth (see hud_controller/concurrency.py).
 """
 import verifiers as vf
 
+from hud_controller.concurrency import AdaptiveLimiter, is_error_payload, vllm_queue_depth
+
+VLLM_BASE_URL = "http://localhost:8000/v1"
+CONCURRENCY_FLOOR = 8
+CONCURRENCY_CEILING = 64
+
+
+def adaptive_rollouts(env, limiter: AdaptiveLimiter):
+    """Admit env rollouts through the limiter and time each tool response for it."""
+    env.rollout = limiter.wrap(env.rollout)
+    # env_response returns (tool messages, state); tool errors come back as message text
+    env.env_response = limiter.timed(env.env_response, is_error=lambda response: is_error_payload(response[0]))
+
+
 def main():
     env = vf.load_environment(
         env_id="hud-vf-gym",
         taskset="kizro/deep_research_taskset-50rows_filtered",  
         config_path="./configs/deepresearch.yaml",
     )
+    limiter = AdaptiveLimiter(
+        floor=CONCURRENCY_FLOOR,
+        ceiling=CONCURRENCY_CEILING,
+        queue_depth=lambda: vllm_queue_depth(VLLM_BASE_URL),
+        on_change=lambda old, new, reason: print(f"Episode concurrency {old} -> {new} ({reason})"),
+    )
+    adaptive_rollouts(env, limiter)
     
     # 2. Load model and tokenizer
     model_name = "Qwen/Qwen2.5-14B-Instruct"
@@ -71,6 +94,8 @@ def main():
     args.num_generations = 16    
     args.gradient_accumulation_steps = 1
     args.max_grad_norm = 0.003
+    # The limiter does the admission; verifiers' own cap just has to stay out of its way
+    args.max_concurrent = CONCURRENCY_CEILING
     args.learning_rate = 5e-5
     
     # Memory optimization settings